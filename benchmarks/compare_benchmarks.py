@@ -0,0 +1,73 @@
+"""
+Compare two result files of run_benchmarks.py, e.g. of two commits
+
+Prints the best time of each case in both files and their ratio
+(new / old); ratios above the threshold are flagged as regressions.
+
+Usage:
+    python3 benchmarks/compare_benchmarks.py old.json new.json [-t 1.2]
+"""
+
+import sys
+import json
+import argparse
+
+
+def get_case_id(result) -> str:
+    """Identity of a benchmark case: name and sorted parameters"""
+    params = ", ".join(
+        "{}={}".format(key, value)
+        for key, value in sorted(result["params"].items())
+    )
+    return "{}({})".format(result["name"], params)
+
+
+def read_results(ifname) -> dict:
+    """Best times of a result file by case"""
+    with open(ifname, "r") as fobj:
+        results = json.load(fobj)["results"]
+    return {get_case_id(result): result["best"] for result in results}
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="compare randtest benchmark results",
+    )
+    parser.add_argument("fname_old", type=str, help="old result file.")
+    parser.add_argument("fname_new", type=str, help="new result file.")
+    parser.add_argument(
+        "-t",
+        metavar="threshold",
+        type=float,
+        default=1.2,
+        help="ratio new / old flagged as regression (default: 1.2).",
+    )
+    args = parser.parse_args()
+
+    old = read_results(args.fname_old)
+    new = read_results(args.fname_new)
+    num_regressions = 0
+    for case_id in sorted(set(old) & set(new)):
+        ratio = new[case_id] / old[case_id]
+        flag = ""
+        if ratio > args.t:
+            flag = "  <-- regression"
+            num_regressions += 1
+        print("{:.4g} s -> {:.4g} s ({:.2f}x) {}{}".format(
+            old[case_id],
+            new[case_id],
+            ratio,
+            case_id,
+            flag,
+        ))
+    for case_id in sorted(set(old) ^ set(new)):
+        print("only in {}: {}".format(
+            args.fname_old if case_id in old else args.fname_new,
+            case_id,
+        ))
+    sys.exit(1 if num_regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Benchmark suite of randtest
+
+Times randtest() across sample sizes, numbers of permutations, numbers of
+jobs, methods (systematic and Monte Carlo), and the shipped measures of
+central tendency, as well as the throughput of read_data() per format.
+Data are generated from a fixed seed, so the suite runs offline and the
+results of different commits are comparable (see compare_benchmarks.py).
+
+Results are written to a JSON file:
+    {"metadata": {...}, "results": [{"name", "params", "times", ...}]}
+
+Usage:
+    python3 benchmarks/run_benchmarks.py [-o results.json] [-q] [-r 3]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing as mp
+from statistics import mean, median
+import numpy as np
+from randtest import randtest, __version__
+from randtest.mcts import trimmed_mean
+from randtest.argparser_bp import read_data
+
+
+MCTS = {
+    "mean": mean,
+    "trimmed_mean": trimmed_mean,
+}
+
+
+def get_metadata() -> dict:
+    """Machine and version information of a benchmark run"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            check=True,
+        ).stdout.decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "randtest": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": mp.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def time_call(function, repeat) -> list:
+    """Wall times in seconds of repeated calls of function"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def get_data(n_data, seed=0) -> tuple:
+    """Data of two groups of size n_data each (shifted normal data)"""
+    rng = np.random.default_rng(seed)
+    data_group_a = rng.normal(100.5, 15., n_data).round(1)
+    data_group_b = rng.normal(100., 15., n_data).round(1)
+    return tuple(data_group_a.tolist()), tuple(data_group_b.tolist())
+
+
+def get_randtest_cases(quick) -> list:
+    """Parameters of the randtest() benchmarks"""
+    cases = []
+    # Systematic: all permutations of small groups
+    for n_data in ([6, 8] if quick else [6, 8, 10, 12]):
+        for mct in MCTS:
+            cases.append(dict(
+                n_data=n_data,
+                mct=mct,
+                num_permutations=-1,
+                num_jobs=1,
+            ))
+    for n_data in ([10, 1000] if quick else [10, 100, 1000, 10000]):
+        for num_permutations in ([1000] if quick else [1000, 10000]):
+            for mct in MCTS:
+                for num_jobs in ([1] if quick else [1, -1]):
+                    cases.append(dict(
+                        n_data=n_data,
+                        mct=mct,
+                        num_permutations=num_permutations,
+                        num_jobs=num_jobs,
+                    ))
+    return cases
+
+
+def bench_randtest(case, repeat) -> dict:
+    """Benchmark of randtest() with the parameters of case"""
+    data_group_a, data_group_b = get_data(case["n_data"])
+    results = []
+
+    def run():
+        results.append(randtest(
+            data_group_a,
+            data_group_b,
+            mct=MCTS[case["mct"]],
+            num_permutations=case["num_permutations"],
+            num_jobs=case["num_jobs"],
+            seed=0,
+        ))
+
+    times = time_call(run, repeat)
+    return {
+        "name": "randtest",
+        "params": dict(case, method=results[0].method),
+        "times": times,
+        "best": min(times),
+        "median": median(times),
+        "permutations_per_second": results[0].num_permutations / min(times),
+    }
+
+
+def bench_read_data(n_data, data_format, repeat) -> dict:
+    """Benchmark of read_data() for n_data numbers in data_format"""
+    data = np.random.default_rng(0).normal(100., 15., n_data).round(1)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, "data")
+        if data_format == "npy":
+            fname += ".npy"
+            np.save(fname, data)
+        elif data_format == "raw":
+            fname += ".raw"
+            data.astype("<f8").tofile(fname)
+        else:
+            fname += ".dat"
+            np.savetxt(fname, data, fmt="%g")
+        # Touch all data, memory-mapped files included
+        times = time_call(lambda: float(np.sum(read_data(fname))), repeat)
+    return {
+        "name": "read_data",
+        "params": {"n_data": n_data, "format": data_format},
+        "times": times,
+        "best": min(times),
+        "median": median(times),
+        "numbers_per_second": n_data / min(times),
+    }
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="randtest benchmark suite")
+    parser.add_argument(
+        "-o",
+        metavar="output",
+        type=str,
+        default="benchmark_results.json",
+        help="JSON output file (default: 'benchmark_results.json').",
+    )
+    parser.add_argument(
+        "-q",
+        action="store_true",
+        help="quick run with fewer cases (default: False).",
+    )
+    parser.add_argument(
+        "-r",
+        metavar="repeat",
+        type=int,
+        default=3,
+        help="number of timed runs per case (default: 3).",
+    )
+    args = parser.parse_args()
+
+    results = []
+    for case in get_randtest_cases(args.q):
+        results.append(bench_randtest(case, args.r))
+        print(
+            "randtest  {params}: {best:.4g} s".format(**results[-1]),
+            file=sys.stderr,
+        )
+    for n_data in ([10 ** 5] if args.q else [10 ** 5, 10 ** 6]):
+        for data_format in ["text", "npy", "raw"]:
+            results.append(bench_read_data(n_data, data_format, args.r))
+            print(
+                "read_data {params}: {best:.4g} s".format(**results[-1]),
+                file=sys.stderr,
+            )
+
+    with open(args.o, "w") as fobj:
+        json.dump(
+            {"metadata": get_metadata(), "results": results},
+            fobj,
+            indent=2,
+        )
+    print("Results written to {}".format(args.o), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
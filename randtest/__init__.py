@@ -9,7 +9,10 @@ E. Edgington and P. Onghena, Randomization Tests, 4th ed.
     Boca Raton, FL: Chapman & Hall/CRC, Taylor & Francis Group, 2007.
 """
 
-from .base import randtest
+from .base import randtest, merge_shards
+from .many import randtest_many
+from .session import RandTestSession
+from .streaming import StreamingRandTest
 
 __author__ = "E. Stripling"
 __email__ = "estripling042@gmail.com"
@@ -2,20 +2,213 @@
 argparse boilerplate code
 """
 
-import ast
+import os
+import csv
 import argparse
 import textwrap
+import numpy as np
 from randtest import __version__
+from randtest.shards import parse_shard
 
 
-def read_data(ifname):
-    """Read in data: assuming no header, only numbers"""
-    with open(ifname, 'r') as fobj:
-        data = (
-            ast.literal_eval(num.strip())
-            for num in fobj.readlines()
+# Data formats by file extension, otherwise text
+DATA_FORMATS = {
+    ".npy": "npy",
+    ".f64": "raw",
+    ".bin": "raw",
+    ".raw": "raw",
+}
+
+# Approximate number of bytes of text parsed at once
+TEXT_CHUNK_SIZE = 2 ** 22
+
+# Number of rows of a table parsed at once
+TABLE_CHUNK_ROWS = 2 ** 16
+
+
+def read_data(ifname, data_format=None):
+    """
+    Read in data: assuming no header, only numbers
+    Formats: 'text' (whitespace-separated numbers), 'npy' (NumPy file),
+    and 'raw' (little-endian float64). Binary files are memory-mapped.
+    If data_format is None, it is chosen by the file extension.
+    """
+    if data_format is None:
+        extension = os.path.splitext(ifname)[1].lower()
+        data_format = DATA_FORMATS.get(extension, "text")
+    if data_format == "npy":
+        return np.load(ifname, mmap_mode="r")
+    if data_format == "raw":
+        return np.memmap(ifname, dtype="<f8", mode="r")
+    return read_text(ifname)
+
+
+def read_text(ifname):
+    """Parse whitespace-separated numbers in bulk, chunk by chunk"""
+    chunks = []
+    with open(ifname, "rb") as fobj:
+        while True:
+            lines = fobj.readlines(TEXT_CHUNK_SIZE)
+            if not lines:
+                break
+            chunks.append(np.array(b"".join(lines).split(), dtype=float))
+    if not chunks:
+        return np.empty(0)
+    return np.concatenate(chunks)
+
+
+def to_numbers(values, ifname, value_columns):
+    """Float array of the cells of the value columns (one per column)"""
+    try:
+        return values.astype(float)
+    except ValueError:
+        for i, column in enumerate(value_columns):
+            try:
+                values[:, i].astype(float)
+            except ValueError:
+                raise ValueError(
+                    "### error: column '{}' in '{}' is not numerical, "
+                    "select the value columns with -c.".format(column, ifname)
+                ) from None
+        raise
+
+
+def iter_table_rows(reader, ifname, num_cells):
+    """
+    Chunks of TABLE_CHUNK_ROWS rows of a table. Blank lines are skipped,
+    rows with another number of cells than the header raise ValueError.
+    """
+    rows = []
+    for row in reader:
+        if not row:
+            continue
+        if len(row) != num_cells:
+            raise ValueError(
+                "### error: line {} of '{}' has {} cells, expected {}."
+                .format(reader.line_num, ifname, len(row), num_cells)
+            )
+        rows.append(row)
+        if len(rows) == TABLE_CHUNK_ROWS:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def read_table(ifname, group_column, value_columns=None, groups=None):
+    """
+    Read in a table (CSV, or TSV by extension) with a header, a column of
+    group labels, and columns of values, streamed in chunks of rows.
+    If value_columns is None, all columns but the group column are used;
+    all value columns must be numerical.
+    If groups is None, the first two labels in the file are groups A and
+    B, otherwise rows of other groups are skipped. Blank lines and empty
+    cells are skipped; cells such as 'nan' are kept as NaN values.
+    Returns a list of (value column, data of group A, data of group B).
+    """
+    delimiter = "\t" if ifname.lower().endswith(".tsv") else ","
+    with open(ifname, "r", newline="") as fobj:
+        reader = csv.reader(fobj, delimiter=delimiter)
+        header = next(reader, [])
+        if value_columns is None:
+            value_columns = [
+                column for column in header if column != group_column
+            ]
+        for column in [group_column] + list(value_columns):
+            if column not in header:
+                raise ValueError(
+                    "### error: column '{}' not found in '{}'."
+                    .format(column, ifname)
+                )
+        group_index = header.index(group_column)
+        value_indices = [header.index(column) for column in value_columns]
+        labels = [] if groups is None else list(groups)
+        chunks = {label: [] for label in labels}
+        for rows in iter_table_rows(reader, ifname, len(header)):
+            cells = np.array(rows, dtype=str)
+            group_labels = cells[:, group_index]
+            if groups is None:
+                for label in dict.fromkeys(group_labels.tolist()):
+                    if label not in chunks:
+                        labels.append(label)
+                        chunks[label] = []
+                if len(labels) > 2:
+                    raise ValueError(
+                        "### error: more than two groups in '{}' ({}), "
+                        "select two of them.".format(ifname, labels)
+                    )
+            for label in labels:
+                values = cells[group_labels == label][:, value_indices]
+                empty = values == ""
+                chunks[label].append((
+                    to_numbers(np.where(empty, "nan", values), ifname,
+                               value_columns),
+                    empty,
+                ))
+    if len(labels) != 2:
+        raise ValueError(
+            "### error: two groups required in '{}', found {}."
+            .format(ifname, labels)
+        )
+    no_rows = np.empty((0, len(value_columns)))
+    data, empty = [], []
+    for label in labels:
+        chunk_values, chunk_empty = zip(*chunks[label] or [(no_rows,) * 2])
+        data.append(np.concatenate(chunk_values))
+        empty.append(np.concatenate(chunk_empty).astype(bool))
+    return [
+        (
+            column,
+            data[0][~empty[0][:, i], i],
+            data[1][~empty[1][:, i], i],
         )
-    return data
+        for i, column in enumerate(value_columns)
+    ]
+
+
+def read_groups(args):
+    """
+    Read in the data of groups A and B from the CLI arguments: either two
+    data files or one table with a group column (`-g`).
+    Returns a list of (value column, data of group A, data of group B);
+    the value column is None for two data files.
+    """
+    if args.g is None:
+        if args.fname_data_B is None:
+            raise ValueError(
+                "### error: two data files required without group column."
+            )
+        return [(
+            None,
+            read_data(args.fname_data_A, args.format),
+            read_data(args.fname_data_B, args.format),
+        )]
+    if args.fname_data_B is not None:
+        raise ValueError(
+            "### error: one table required with group column."
+        )
+    return read_table(args.fname_data_A, args.g, args.c, args.groups)
+
+
+def get_column_fname(fname, column):
+    """
+    File name (e.g., of a checkpoint) of the test of a value column,
+    suffixed with the column for tables
+    """
+    if fname is None or column is None:
+        return fname
+    return "{}.{}".format(fname, column)
+
+
+def get_shard(args, column):
+    """Shard (`--shard`) of the test of a value column, or None"""
+    if args.shard is None:
+        return None
+    shard = parse_shard(args.shard, None)
+    fname = args.shard_file
+    if fname is None:
+        fname = "randtest_shard_{}_of_{}.json".format(shard.index, shard.count)
+    return shard._replace(fname=get_column_fname(fname, column))
 
 
 def argparse_cli(description):
@@ -68,14 +261,96 @@ def argparse_cli(description):
         help="seed to initialize the random number generator (default: None)",
     )
 
+    parser.add_argument(
+        "-f",
+        "--format",
+        metavar="format",
+        type=str,
+        choices=["text", "npy", "raw"],
+        default=None,
+        help=(
+            "format of the data files: 'text', 'npy', or 'raw' float64 " +
+            "(default: by file extension, otherwise 'text')."
+        ),
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the timings of the phases of the test (default: False).",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="file",
+        type=str,
+        default=None,
+        help="checkpoint file: resume the test from it if it exists and "
+        "save the progress to it every minute (default: None).",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="index/count",
+        type=str,
+        default=None,
+        help=(
+            "run only shard index (1 to count) of the permutations and " +
+            "write its partial result, see randtest-merge (default: None)."
+        ),
+    )
+    parser.add_argument(
+        "--shard-file",
+        metavar="file",
+        type=str,
+        default=None,
+        help=(
+            "file of the partial result of the shard " +
+            "(default: 'randtest_shard_<index>_of_<count>.json')."
+        ),
+    )
+
+    parser.add_argument(
+        "-g",
+        metavar="group_column",
+        type=str,
+        default=None,
+        help=(
+            "read a single CSV table with a header and this column of " +
+            "group labels instead of two data files (default: None)."
+        ),
+    )
+    parser.add_argument(
+        "-c",
+        metavar="value_column",
+        type=str,
+        action="append",
+        default=None,
+        help=(
+            "value column of the table to be tested, can be repeated " +
+            "(default: all columns but the group column)."
+        ),
+    )
+    parser.add_argument(
+        "--groups",
+        metavar=("label_A", "label_B"),
+        type=str,
+        nargs=2,
+        default=None,
+        help=(
+            "labels of groups A and B in the group column " +
+            "(default: the first two labels in the table)."
+        ),
+    )
+
     parser.add_argument(
         "fname_data_A",
         type=str,
-        help="file name group A data.",
+        help="file name group A data (or of the table, see -g).",
     )
     parser.add_argument(
         "fname_data_B",
         type=str,
+        nargs="?",
+        default=None,
         help="file name group B data.",
     )
     return parser
@@ -12,12 +12,91 @@ Allows for user-defined:
 """
 
 import random
+import queue
+import pickle
 import logging
+from math import inf
 import functools
 import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
 from types import FunctionType, GeneratorType
-from itertools import combinations
-from statistics import mean
+from collections import deque, namedtuple
+from itertools import compress, count
+from statistics import mean, median as statistics_median
+from uuid import uuid4
+import numpy as np
+from .mcts import (
+    arithmetic_mean,
+    trimmed_mean,
+    median,
+    mean_rank,
+    midranks,
+    batch_arithmetic_mean,
+    batch_trimmed_mean,
+    batch_median,
+)
+from .combinatorics import (
+    binomial,
+    iter_combinations,
+    unrank_revolving_door,
+    revolving_door_successor,
+)
+from .exact import (
+    MAX_CELLS,
+    discretize,
+    num_cells,
+    rank_sum_counts,
+    stratified_num_cells,
+    stratified_sum_counts,
+    subset_sum_counts,
+)
+from .strata import (
+    draw_stratified,
+    get_strata,
+    iter_stratified,
+    num_stratified_permutations,
+)
+from .sequential import is_settled
+from .progress import ProgressReporter
+from .cache import count_outside, get_cache_key, make_null_distribution
+from .checkpoint import Checkpoint, add_interval, subtract_intervals
+from .shards import get_shard_range, read_shards, write_shard
+from .profiling import (
+    add_block_record,
+    get_block_record,
+    get_times,
+    start_timer,
+    timed,
+)
+
+
+# Upper bound on the number of data points gathered per block of
+# permutations, i.e. block length * len(data)
+BLOCK_SIZE = 2 ** 20
+
+# Number of blocks of permutations per job for load balancing
+BLOCKS_PER_JOB = 4
+
+# Number of blocks per job submitted to the pool ahead of the results
+BLOCKS_IN_FLIGHT_PER_JOB = 2
+
+# Length of the first block of permutations in the sequential test
+SEQUENTIAL_BLOCK_LENGTH = 100
+
+# Maximum number of Monte Carlo permutations drawn from one random stream
+RANDOM_BLOCK_LENGTH = 1000
+
+# Maximum number of enumerated permutations whose values are cached
+MAX_CACHED_PERMUTATIONS = 2 ** 24
+
+# Block of Monte Carlo permutations drawn from the stream-th random stream
+# spawned from the seed, such that results do not depend on the scheduling
+RandomBlock = namedtuple("RandomBlock", ["stream", "length"])
+
+# RandTest instance of a worker process, set by the pool initializer
+# or, for persistent pools, identified by a token per test
+_WORKER_RANDTEST = None
+_WORKER_TOKEN = None
 
 
 class RandTestResult():
@@ -49,12 +128,19 @@ class RandTestResult():
             larger than or equal to the observed test statistic value.
 
         num_permutations : int
-            Number of permutations.
+            Number of permutations. For the sequential Monte Carlo
+            randomization test, the number of permutations actually used.
 
         p_value : int
-            The p value is equal to `num_successes / num_permutations`.
+            The p value is equal to `num_successes / num_permutations`,
+            nan without permutations (e.g., the partial result of a shard
+            that has none).
 
         seed : int, None,
+
+        timings : dict, None
+            Wall and CPU times per phase, permutations per second, and
+            per-worker counts if profiled, otherwise None.
     """
 
     def __init__(
@@ -66,7 +152,8 @@ class RandTestResult():
             statistic: float,
             num_successes=0,
             num_permutations=0,
-            seed=None):
+            seed=None,
+            timings=None):
         self._method = method
         self._alternative = alternative
         self._mcta = mcta
@@ -75,6 +162,7 @@ class RandTestResult():
         self._nhits = num_successes
         self._nperms = num_permutations
         self._seed = seed
+        self._timings = timings
 
     @property
     def method(self) -> str:
@@ -114,6 +202,8 @@ class RandTestResult():
     @property
     def p_value(self) -> float:
         """Getter: p_value"""
+        if self.num_permutations == 0:
+            return float("nan")
         return self.num_successes / self.num_permutations
 
     @property
@@ -121,6 +211,11 @@ class RandTestResult():
         """Getter: seed"""
         return self._seed
 
+    @property
+    def timings(self) -> dict:
+        """Getter: timings"""
+        return self._timings
+
     def __repr__(self):
         repr_string = "{}".format(
             self.__class__,
@@ -160,6 +255,9 @@ class RandTest:
 
     Carries out the computation of a randomization test.
     """
+    # Arrays put into shared memory for worker processes, once per test
+    shared_arrays = ("data", "data_array")
+
     def __init__(self,
                  data_group_a,
                  data_group_b,
@@ -168,38 +266,296 @@ class RandTest:
                  num_permutations,
                  alternative,
                  n_jobs,
-                 seed):
+                 seed,
+                 alpha=None,
+                 tolerance=1e-3,
+                 progress=None,
+                 cache=None,
+                 profile=False,
+                 checkpoint=None,
+                 checkpoint_interval=60.,
+                 shard=None,
+                 strata=None):
+        setup_start = start_timer()
+        self._init_test(
+            num_permutations,
+            alternative,
+            n_jobs,
+            seed,
+            alpha,
+            tolerance,
+            progress,
+            cache,
+            profile,
+            checkpoint,
+            checkpoint_interval,
+            shard,
+        )
         self.mct = mct
         self.tstat = tstat
-        self.method = (
-            "Monte Carlo"
-            if num_permutations > 1 else
-            "Systematic"
+
+        # Rank statistics: rank the pooled data once, permutations then
+        # only sum the ranks of group A
+        if self.mct is mean_rank:
+            ranks, self.rank_ties = midranks(
+                tuple(data_group_a) + tuple(data_group_b)
+            )
+            data_group_a = ranks[:len(data_group_a)]
+            data_group_b = ranks[len(data_group_a):]
+
+        # Numerical data are stored as one contiguous array
+        if (isinstance(data_group_a, np.ndarray) and
+                isinstance(data_group_b, np.ndarray)):
+            data = np.concatenate([data_group_a, data_group_b])
+        else:
+            data = tuple(data_group_a) + tuple(data_group_b)
+        self._init_data(data, len(data_group_a))
+        # Stratified tests: permutations within strata (labels per item)
+        if strata is not None:
+            self.strata = get_strata(strata, self.n_x)
+
+        # Vectorized engine: only for built-in MCTs and numerical data
+        self.batch_mct = (
+            get_batch_mct(self.mct)
+            if self.tstat is test_statistic else
+            None
+        )
+        self.data_array = (
+            as_float_array(self.data)
+            if self.batch_mct is not None else
+            None
+        )
+        # Difference of means is increasing in the sum of group A, the
+        # grand total being fixed: the sum is a sufficient statistic
+        self.sum_statistic = self.batch_mct is batch_arithmetic_mean
+        if self.data_array is None:
+            # User-defined functions receive Python numbers, as given
+            self.batch_mct = None
+            items = self._get_items()
+            self.tobs = self.tstat(
+                items[:self.n_x],
+                items[self.n_x:],
+                self.mct,
+            )
+        else:
+            # Built-in statistics: float64 data only
+            self.data = self.data_array
+            self.tobs = self.tstat(
+                self.data[:self.n_x],
+                self.data[self.n_x:],
+                self.mct,
+            )
+            self.batch_tobs = self._compute_batch_values(
+                np.arange(self.n_x)[np.newaxis, :]
+            )[0]
+            if self.sum_statistic:
+                # Sum of group A for which the test statistic is zero
+                self.batch_center = (
+                    self.data_array.sum() * self.n_x / self.n_data
+                )
+                scale = np.abs(self.data_array).sum()
+            else:
+                self.batch_center = 0.
+                # Magnitude of the data, not of tobs: tobs may be (close
+                # to) zero while the values still differ by rounding
+                scale = np.abs(self.data_array).max(initial=0.)
+            # Tolerance absorbs rounding differences between permutations
+            # that yield the observed test statistic value
+            self.batch_gamma = scale * np.finfo(float).eps * 100
+        self.block_size = max(1, BLOCK_SIZE // max(1, self.n_data))
+
+        # Difference of means on data with an integer grid: systematic
+        # tests use exact integer sums of group A
+        self.int_values = (
+            discretize(self.data)
+            if self.method == "Systematic" and self.sum_statistic else
+            None
+        )
+        if self.int_values is not None:
+            self.int_total = sum(self.int_values)
+            self.int_bounds = self._get_sum_bounds()
+
+        # Balanced systematic test with antisymmetric test statistic: the
+        # complement of a combination yields the negated statistic value,
+        # so only combinations that include a fixed data point are needed
+        self.mirror = (
+            self.method == "Systematic" and
+            self.tstat is test_statistic and
+            self.strata is None and
+            2 * self.n_x == self.n_data > 0
         )
+
+        # Profiling: timings of the phases of the test
+        if profile:
+            self.timings = {"setup": get_times(setup_start)}
+
+    def _init_test(self,
+                   num_permutations,
+                   alternative,
+                   n_jobs,
+                   seed,
+                   alpha=None,
+                   tolerance=1e-3,
+                   progress=None,
+                   cache=None,
+                   profile=False,
+                   checkpoint=None,
+                   checkpoint_interval=60.,
+                   shard=None):
+        """
+        Set up the state shared by all tests (see RandTestMany): method,
+        seed, progress, counters, checkpoints, and shards. Engines that
+        depend on the data (ranks, strata, exact sums, mirroring) are off
+        until set up by the constructor.
+        """
+        if num_permutations <= 1:
+            self.method = "Systematic"
+        elif alpha is None:
+            self.method = "Monte Carlo"
+        else:
+            self.method = "Sequential Monte Carlo"
         self.alternative = alternative
+        self.alpha = alpha
+        self.tolerance = tolerance
+        self.progress = ProgressReporter() if progress is None else progress
+        self.cache = cache
         self.njobs = n_jobs
-        self.rng = check_random_state(seed)
+        self.seed_sequence = get_seed_sequence(seed)
+        # Resumed tests adopt the seed of the checkpoint if none is given
+        self.fresh_seed = seed is None
 
-        self.tobs = self.tstat(data_group_a, data_group_b, self.mct)
-        self.data = data_group_a + data_group_b
-        self.n_x = len(data_group_a)
-        self.n_data = len(self.data)
+        self.rank_ties = None
+        self.strata = None
+        self.int_values = None
+        self.mirror = False
 
         self.num_successes = 0
         self.num_permutations = num_permutations
 
+        # Checkpoints: completed positions (ranks or stream indices)
+        self.checkpoint = (
+            Checkpoint(checkpoint, checkpoint_interval)
+            if checkpoint is not None else
+            None
+        )
+        self.completed = []
+        # Sharding: only the permutations of this shard are run
+        self.shard = shard
+        self.num_drawn = 0
+
+        self.profile = profile
+        self.timings = None
+
+    def _init_data(self, data, n_x):
+        """
+        Set up the pooled data (group A first, n_x items along the last
+        axis) and the per-item state of the generic engine
+        """
+        self.data = data
+        self.items = None
+        self.shared = {}
+        self.shared_memories = []
+        self.n_x = n_x
+        self.n_data = (
+            data.shape[-1]
+            if isinstance(data, np.ndarray) else
+            len(data)
+        )
+        self.mask_group_b = bytearray(b"\x01") * self.n_data
+
+    def __getstate__(self):
+        """
+        Workers do not report progress (callbacks may not pickle), create
+        the Python objects of the data on demand, and attach to the shared
+        arrays instead of receiving copies
+        """
+        state = self.__dict__.copy()
+        state["progress"] = None
+        state["cache"] = None
+        state["timings"] = None
+        state["items"] = None
+        state["shared_memories"] = []
+        for name in self.shared:
+            state[name] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        arrays = {}
+        for name, (shm_name, shape, dtype) in self.shared.items():
+            if shm_name not in arrays:
+                shm = SharedMemory(name=shm_name)
+                self.shared_memories.append(shm)
+                arrays[shm_name] = np.ndarray(shape, dtype, buffer=shm.buf)
+                arrays[shm_name].flags.writeable = False
+            setattr(self, name, arrays[shm_name])
+
+    def share_arrays(self):
+        """Copy the shared arrays into shared memory blocks"""
+        blocks = {}
+        for name in self.shared_arrays:
+            array = getattr(self, name, None)
+            if not isinstance(array, np.ndarray) or array.nbytes == 0:
+                continue
+            if id(array) not in blocks:
+                shm = SharedMemory(create=True, size=array.nbytes)
+                np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = (
+                    array
+                )
+                self.shared_memories.append(shm)
+                blocks[id(array)] = shm.name
+            self.shared[name] = (blocks[id(array)], array.shape,
+                                 array.dtype.str)
+
+    def unshare_arrays(self):
+        """Free the shared memory blocks (process that shared them)"""
+        for shm in self.shared_memories:
+            shm.close()
+            shm.unlink()
+        self.shared = {}
+        self.shared_memories = []
+
+    def detach_arrays(self):
+        """Detach from the shared memory blocks (worker processes)"""
+        for name in self.shared:
+            setattr(self, name, None)
+        self.items = None
+        for shm in self.shared_memories:
+            shm.close()
+        self.shared_memories = []
+
     def compute_test_statistic(self, idx_group_a) -> bool:
         """Function to the multiprocessing computation of the test statistic"""
-        idx_group_b = (
-            i
-            for i in range(self.n_data)
-            if i not in idx_group_a
-        )
+        return self._is_success(self._compute_tval(idx_group_a))
+
+    def _compute_tval(self, idx_group_a) -> float:
+        """Test statistic value of a permutation"""
+        # Reusable mask of group B: O(n) split instead of membership tests
+        mask_group_b = self.mask_group_b
+        items = self._get_items()
+        for i in idx_group_a:
+            mask_group_b[i] = 0
         tval = self.tstat(
-            (self.data[i] for i in idx_group_a),
-            (self.data[j] for j in idx_group_b),
+            (items[i] for i in idx_group_a),
+            compress(items, mask_group_b),
             self.mct,
         )
+        for i in idx_group_a:
+            mask_group_b[i] = 1
+        return tval
+
+    def _get_items(self):
+        """Data as Python objects for user-defined functions (created once)"""
+        if self.items is None:
+            self.items = (
+                tuple(self.data.tolist())
+                if isinstance(self.data, np.ndarray) else
+                self.data
+            )
+        return self.items
+
+    def _is_success(self, tval) -> bool:
+        """Compare a test statistic value with the observed one"""
         if self.alternative == "two_sided":
             hit = abs(tval) >= abs(self.tobs)
         elif self.alternative == "greater":
@@ -208,41 +564,637 @@ class RandTest:
             hit = tval <= self.tobs
         return hit
 
-    def run(self):
-        """Run the multiprocessing computation of randomization test."""
+    def get_block_result(self, block) -> tuple:
+        """
+        Number of permutations and successes of a block. If profiling or
+        checkpointing, followed by a dict with the record of the wall and
+        CPU times of the sampling and of the statistic in this process
+        ("record") and the interval of positions of the block ("position").
+        """
+        if not self.profile and self.checkpoint is None:
+            return self.count_successes(block)
+        info = {}
+        if self.checkpoint is not None:
+            info["position"] = (
+                (block.stream, block.stream + 1)
+                if isinstance(block, RandomBlock) else
+                (block.start, block.stop)
+            )
+        if not self.profile:
+            return self.count_successes(block) + (info,)
+        block_timings = {}
+        with timed(block_timings, "sampling"):
+            if isinstance(block, RandomBlock):
+                block = self._get_random_indices(block)
+        with timed(block_timings, "statistic"):
+            result = self.count_successes(block)
+        info["record"] = get_block_record(block_timings)
+        return result + (info,)
+
+    def count_successes(self, block) -> tuple:
+        """
+        Compute the number of successes of a block of permutations
+
+        The block is either a range of combination ranks (systematic), a
+        RandomBlock (Monte Carlo), or a (n_block, n_x) array of group A
+        indices. Returns the number of permutations and successes.
+        For mirrored systematic tests, each combination also accounts
+        for its complement.
+        """
+        mirror = self.mirror and isinstance(block, range)
+        if isinstance(block, RandomBlock):
+            block = self._get_random_indices(block)
+        if isinstance(block, range) and self.strata is not None:
+            idx_block = iter_stratified(self.strata, block.start, block.stop)
+        elif isinstance(block, range) and self.int_values is not None:
+            return self._count_revolving_door(block)
+        elif isinstance(block, range):
+            idx_block = iter_combinations(
+                self.n_data,
+                self.n_x,
+                block.start,
+                block.stop,
+            )
+        elif self.batch_mct is None:
+            idx_block = block.tolist()
+        else:
+            idx_block = block
+        if self.batch_mct is None:
+            num_successes = 0
+            for idx_group_a in idx_block:
+                tval = self._compute_tval(idx_group_a)
+                num_successes += int(self._is_success(tval))
+                if mirror:
+                    num_successes += int(self._is_success(-tval))
+        else:
+            values = self._compute_batch_values(
+                np.array(tuple(idx_block), dtype=int)
+                .reshape(len(block), self.n_x)
+            )
+            num_successes = self._count_batch_successes(values)
+            if mirror:
+                num_successes += self._count_batch_successes(
+                    2 * self.batch_center - values
+                )
+        num_permutations = 2 * len(block) if mirror else len(block)
+        return num_permutations, num_successes
+
+    def _count_revolving_door(self, block) -> tuple:
+        """
+        Number of permutations and successes of a range of revolving door
+        ranks: the sum of group A is updated in O(1) per combination
+        """
+        values = self.int_values
+        lower, upper = self.int_bounds
+        if self.mirror:
+            # Mirrored sum of group A: int_total - sum_a
+            mirror_lower = self.int_total - upper
+            mirror_upper = self.int_total - lower
+        else:
+            mirror_lower, mirror_upper = -inf, inf
+        combination = list(
+            unrank_revolving_door(block.start, self.n_data, self.n_x)
+        )
+        sum_a = sum(values[i] for i in combination)
+        num_successes = 0
+        for step in range(len(block)):
+            if step:
+                removed, added = revolving_door_successor(
+                    combination,
+                    self.n_data,
+                )
+                sum_a += values[added] - values[removed]
+            if sum_a >= upper or sum_a <= lower:
+                num_successes += 1
+            if sum_a >= mirror_upper or sum_a <= mirror_lower:
+                num_successes += 1
+        num_permutations = 2 * len(block) if self.mirror else len(block)
+        return num_permutations, num_successes
+
+    def _get_sum_bounds(self) -> tuple:
+        """
+        Integer sums of group A (lower, upper) such that a permutation is a
+        success if and only if sum(group A) <= lower or >= upper
+        """
+        sum_obs = sum(self.int_values[:self.n_x])
+        if self.alternative == "greater":
+            return -inf, sum_obs
+        if self.alternative == "less":
+            return sum_obs, inf
+        # Equal distance to the sum for which the statistic is zero
+        center = self.int_total * self.n_x
+        distance = abs(sum_obs * self.n_data - center)
+        return (
+            (center - distance) // self.n_data,
+            -((distance + center) // -self.n_data),
+        )
+
+    def _count_batch_successes(self, values) -> int:
+        """Compare values of the vectorized engine with the observed one"""
+        hits = is_batch_success(
+            values,
+            self.batch_tobs,
+            self.batch_center,
+            self.batch_gamma,
+            self.alternative,
+        )
+        return int(np.count_nonzero(hits))
+
+    def _compute_batch_values(self, idx_group_a):
+        """
+        Values of a (n_batch, n_x) index matrix to compare with the
+        observed one: the sum of group A for the difference of means,
+        otherwise the test statistic
+        """
+        if self.sum_statistic:
+            return self.data_array[idx_group_a].sum(axis=1)
+        n_batch = idx_group_a.shape[0]
+        mask = np.zeros((n_batch, self.n_data), dtype=bool)
+        mask[np.arange(n_batch)[:, np.newaxis], idx_group_a] = True
+        data = np.broadcast_to(self.data_array, mask.shape)
+        data_group_a = data[mask].reshape(n_batch, self.n_x)
+        data_group_b = data[~mask].reshape(n_batch, self.n_data - self.n_x)
+        return self.batch_mct(data_group_a) - self.batch_mct(data_group_b)
+
+    def run(self, pool=None):
+        """
+        Run the multiprocessing computation of randomization test.
+        If pool is given, e.g. by a RandTestSession, its (warm) worker
+        processes are used instead of starting a new pool.
+        """
+        if self.checkpoint is not None or self.shard is not None:
+            # Identity of the test before the counters are updated
+            self.test_key = self._get_test_key()
+        self.progress.start()
+        with timed(self.timings, "run"):
+            self._run(pool)
+        if self.timings is not None:
+            self.timings["permutations_per_second"] = (
+                self.num_permutations /
+                max(self.timings["run"]["wall"], 1e-9)
+            )
+
+    def _run(self, pool):
+        """Run on the pool, a new pool, or in-process"""
+        # Shards: the cached null distribution would count all permutations
+        # Strata: null distributions are cached for exchangeable data only
+        if (self.cache is not None and
+                self.shard is None and
+                self.strata is None):
+            with timed(self.timings, "cache"):
+                if self._run_cached():
+                    return
+        if (self.int_values is not None and
+                self._get_num_cells() <= MAX_CELLS):
+            if self.shard is not None and self.shard.index > 1:
+                # Exact test: run as a whole by the first shard
+                self.num_permutations = 0
+                return
+            with timed(self.timings, "exact"):
+                self._run_exact()
+            self.num_drawn = self.num_permutations
+            return
+
         if self.method == "Systematic":
             self.num_permutations = 0
-            with mp.Pool(self.njobs) as pool:
-                for is_success in pool.imap_unordered(
-                        self.compute_test_statistic,
-                        combinations(range(self.n_data), self.n_x)):
-                    self.num_permutations += 1
-                    self.num_successes += int(is_success)
-                    self._log_progress()
         else:
             # Valid Monte Carlo Randomization Test includes observed tobs
             self.num_successes += 1
-            with mp.Pool(self.njobs) as pool:
-                for is_success in pool.imap_unordered(
-                        self.compute_test_statistic,
-                        self._get_random_indices()):
-                    self.num_successes += int(is_success)
-                    self._log_progress()
-
-    def _log_progress(self):
-        """Log Progress"""
-        logging.info(
-            "p value = %d / %d = %g",
-            self.num_successes,
+        num_drawn, look = 0, 0
+        if self.checkpoint is not None:
+            num_drawn, look, finished = self._resume(get_cache_key(
+                "checkpoint",
+                self.test_key,
+                self.shard,
+            ))
+            if finished:
+                self.num_drawn = num_drawn
+                self._log_progress(num_drawn, final=True)
+                return
+        blocks = self._get_pending_blocks()
+
+        if pool is None and self.njobs == 1:
+            self._collect(map(self.get_block_result, blocks), num_drawn, look)
+            return
+        # Workers attach to the data in shared memory instead of copying it
+        with timed(self.timings, "share"):
+            self.share_arrays()
+        try:
+            if pool is not None:
+                # Serialize the instance once per test, workers deserialize
+                # it once and reuse it for all blocks of this test
+                with timed(self.timings, "share"):
+                    task = functools.partial(
+                        _count_successes_of,
+                        uuid4().hex,
+                        pickle.dumps(self),
+                    )
+                self._collect(
+                    self._submit_blocks(pool, task, blocks),
+                    num_drawn,
+                    look,
+                )
+            else:
+                # Ship the data once per worker instead of once per task
+                with timed(self.timings, "pool_startup"):
+                    pool = mp.Pool(
+                        self.njobs,
+                        initializer=_init_worker,
+                        initargs=(self,),
+                    )
+                with pool:
+                    self._collect(
+                        self._submit_blocks(pool, _count_successes, blocks),
+                        num_drawn,
+                        look,
+                    )
+        finally:
+            self.unshare_arrays()
+
+    def _submit_blocks(self, pool, task, blocks):
+        """
+        Generate the results of task on the blocks, submitted to the pool
+        lazily: at most a few blocks per job are queued on the workers, so
+        none are left behind on a persistent pool once the test stops
+        early (sequential test) or fails. Sequential test: results in the
+        order drawn, otherwise in the order completed.
+        """
+        max_in_flight = BLOCKS_IN_FLIGHT_PER_JOB * self.njobs
+        ordered = self.method == "Sequential Monte Carlo"
+        # Ordered: results in submission order; unordered: (success, value)
+        # pairs put by the result handler of the pool as blocks complete
+        submitted = deque()
+        completed = queue.SimpleQueue()
+        num_in_flight = 0
+        blocks = iter(blocks)
+        block = next(blocks, None)
+        while block is not None or num_in_flight:
+            while block is not None and num_in_flight < max_in_flight:
+                if ordered:
+                    submitted.append(pool.apply_async(task, (block,)))
+                else:
+                    pool.apply_async(
+                        task,
+                        (block,),
+                        callback=lambda value: completed.put((True, value)),
+                        error_callback=lambda error: completed.put(
+                            (False, error)
+                        ),
+                    )
+                num_in_flight += 1
+                block = next(blocks, None)
+            num_in_flight -= 1
+            if ordered:
+                yield submitted.popleft().get()
+                continue
+            success, value = completed.get()
+            if not success:
+                raise value
+            yield value
+
+    def _run_exact(self):
+        """Exact systematic test from the distribution of sum(group A)"""
+        if self.strata is not None:
+            # Product of the independent strata: convolved distributions
+            counts = stratified_sum_counts(*self._get_stratified_values())
+        elif self.rank_ties is not None:
+            # Depends on the group sizes and the tie pattern only
+            counts = rank_sum_counts(self.n_x, self.rank_ties)
+        else:
+            counts = subset_sum_counts(self.int_values, self.n_x)
+        sums = np.arange(len(counts))
+        lower, upper = self.int_bounds
+        hits = (sums <= lower) | (sums >= upper)
+        self.num_permutations = int(counts.sum())
+        self.num_successes = int(counts[hits].sum())
+        self._log_progress(final=True)
+
+    def _get_num_cells(self) -> int:
+        """Size of the tables of the exact test (see exact.py)"""
+        if self.strata is None:
+            return num_cells(self.int_values, self.n_x)
+        return stratified_num_cells(*self._get_stratified_values())
+
+    def _get_stratified_values(self) -> tuple:
+        """Integer values and numbers of group A units per stratum"""
+        return (
+            [
+                [self.int_values[i] for i in stratum.indices]
+                for stratum in self.strata
+            ],
+            [stratum.n_x for stratum in self.strata],
+        )
+
+    def _run_cached(self) -> bool:
+        """
+        Systematic test from the cached null distribution, computed on
+        a cache miss. Returns False if the null distribution is not
+        cacheable (user-defined functions, too many permutations).
+        """
+        if self.method != "Systematic":
+            return False
+        if (self.int_values is not None and
+                num_cells(self.int_values, self.n_x) <= MAX_CELLS):
+            key = get_cache_key(
+                "subset sums",
+                self.n_x,
+                tuple(sorted(self.int_values)),
+            )
+            bounds = self.int_bounds
+        elif (self.batch_mct is not None and
+                binomial(self.n_data, self.n_x) <= MAX_CACHED_PERMUTATIONS):
+            key = get_cache_key(
+                "statistic",
+                get_function_id(self.batch_mct),
+                self.n_x,
+                np.sort(self.data_array).tobytes(),
+            )
+            bounds = self._get_batch_bounds()
+        else:
+            return False
+        distribution = self.cache.get(key)
+        if distribution is None:
+            distribution = self._get_null_distribution()
+            self.cache.put(key, distribution)
+        self.num_permutations = int(distribution.cumulative_counts[-1])
+        self.num_successes = count_outside(distribution, *bounds)
+        self._log_progress(final=True)
+        return True
+
+    def _get_null_distribution(self):
+        """Distribution of the values over all data permutations"""
+        if (self.int_values is not None and
+                num_cells(self.int_values, self.n_x) <= MAX_CELLS):
+            counts = (
+                subset_sum_counts(self.int_values, self.n_x)
+                if self.rank_ties is None else
+                rank_sum_counts(self.n_x, self.rank_ties)
+            )
+            return make_null_distribution(np.arange(len(counts)), counts)
+        values = []
+        for block in self._get_blocks():
+            idx_block = np.array(
+                tuple(iter_combinations(
+                    self.n_data,
+                    self.n_x,
+                    block.start,
+                    block.stop,
+                )),
+                dtype=int,
+            ).reshape(len(block), self.n_x)
+            values.append(self._compute_batch_values(idx_block))
+            if self.mirror:
+                values.append(2 * self.batch_center - values[-1])
+        return make_null_distribution(np.concatenate(values))
+
+    def _get_batch_bounds(self) -> tuple:
+        """
+        Values (lower, upper) of the vectorized engine such that a
+        permutation is a success if and only if its value is <= lower or
+        >= upper (see is_batch_success())
+        """
+        if self.alternative == "greater":
+            return -inf, self.batch_tobs - self.batch_gamma
+        if self.alternative == "less":
+            return self.batch_tobs + self.batch_gamma, inf
+        distance = abs(self.batch_tobs - self.batch_center) - self.batch_gamma
+        return self.batch_center - distance, self.batch_center + distance
+
+    def _collect(self, block_results, num_drawn=0, look=0):
+        """
+        Accumulate the number of permutations and successes per block
+        (resumed tests: from num_drawn permutations in look blocks)
+        """
+        for look, (num_permutations, num_successes, *info) in enumerate(
+                block_results, start=look + 1):
+            info = info[0] if info else {}
+            if "record" in info:
+                add_block_record(
+                    self.timings,
+                    num_permutations,
+                    info["record"],
+                )
+            if "position" in info:
+                self.completed = add_interval(
+                    self.completed,
+                    *info["position"],
+                )
+            if self.method == "Systematic":
+                self.num_permutations += num_permutations
+            self.num_successes += num_successes
+            num_drawn += num_permutations
+            if (self.method == "Sequential Monte Carlo" and
+                    is_settled(
+                        self.num_successes - 1,
+                        num_drawn,
+                        self.alpha,
+                        self.tolerance,
+                        look)):
+                # Valid Monte Carlo Randomization Test includes observed tobs
+                self.num_permutations = num_drawn + 1
+                break
+            self._log_progress(num_drawn)
+            if self.checkpoint is not None and self.checkpoint.is_due():
+                self._save_checkpoint(num_drawn, look)
+        self.num_drawn = num_drawn
+        self._log_progress(num_drawn, final=True)
+        if self.checkpoint is not None:
+            self._save_checkpoint(num_drawn, look, finished=True)
+
+    def _get_test_key(self) -> str:
+        """Identity of the test (except for the seed and the shard)"""
+        return get_cache_key(
+            self.method,
+            self.alternative,
             self.num_permutations,
-            self.num_successes / self.num_permutations,
+            self.alpha,
+            self.tolerance,
+            self.block_size,
+            self.strata,
+            get_function_id(self.mct),
+            get_function_id(self.tstat),
+            self.n_x,
+            (
+                self.data.tobytes()
+                if isinstance(self.data, np.ndarray) else
+                self.data
+            ),
         )
 
-    def _get_random_indices(self):
-        # Valid Monte Carlo Randomization Test includes observed tobs
-        # Generate one random permutation less
-        for _ in range(self.num_permutations - 1):
-            yield self.rng.sample(range(self.n_data), self.n_x)
+    def _save_checkpoint(self, num_drawn, look, finished=False):
+        """Write the counters, the seed, and the completed positions"""
+        self.checkpoint.save({
+            "key": self.checkpoint_key,
+            "entropy": self.seed_sequence.entropy,
+            "spawn_key": list(self.seed_sequence.spawn_key),
+            "num_successes": int(self.num_successes),
+            "num_permutations": int(self.num_permutations),
+            "num_drawn": num_drawn,
+            "look": look,
+            "completed": self.completed,
+            "finished": finished,
+        })
+
+    def _resume(self, checkpoint_key) -> tuple:
+        """
+        Restore the counters, the seed, and the completed positions from
+        the checkpoint. Returns the number of permutations drawn, the
+        number of blocks (looks), and whether the test has finished.
+        """
+        self.checkpoint_key = checkpoint_key
+        state = self.checkpoint.load(checkpoint_key)
+        if state is None:
+            return 0, 0, False
+        entropy = state["entropy"]
+        if isinstance(entropy, list):
+            entropy = tuple(entropy)
+        spawn_key = tuple(state["spawn_key"])
+        seed_entropy = self.seed_sequence.entropy
+        if isinstance(seed_entropy, list):
+            seed_entropy = tuple(seed_entropy)
+        if self.fresh_seed:
+            self.seed_sequence = np.random.SeedSequence(
+                entropy,
+                spawn_key=spawn_key,
+            )
+        elif (entropy, spawn_key) != (
+                seed_entropy, tuple(self.seed_sequence.spawn_key)):
+            raise ValueError(
+                "### error: checkpoint '{}' was written with another seed."
+                .format(self.checkpoint.fname)
+            )
+        self.num_successes = state["num_successes"]
+        if self.method == "Systematic" or state["finished"]:
+            self.num_permutations = state["num_permutations"]
+        self.completed = state["completed"]
+        return state["num_drawn"], state["look"], state["finished"]
+
+    def _get_pending_blocks(self):
+        """Blocks of permutations without the completed positions"""
+        for block in self._get_blocks():
+            if not self.completed:
+                yield block
+            elif isinstance(block, RandomBlock):
+                if any(subtract_intervals(
+                        block.stream,
+                        block.stream + 1,
+                        self.completed)):
+                    yield block
+            else:
+                yield from subtract_intervals(
+                    block.start,
+                    block.stop,
+                    self.completed,
+                )
+
+    def _get_blocks(self):
+        """Split the permutations into blocks, i.e. tasks for the workers"""
+        first = 0
+        if self.mirror and self.int_values is not None:
+            # Revolving door ranks of the combinations with the last point
+            first = binomial(self.n_data - 1, self.n_x)
+            total = binomial(self.n_data, self.n_x)
+        elif self.mirror:
+            # Lexicographic ranks of the combinations with the first point
+            total = binomial(self.n_data - 1, self.n_x - 1)
+        elif self.method == "Systematic" and self.strata is not None:
+            total = num_stratified_permutations(self.strata)
+        elif self.method == "Systematic":
+            total = binomial(self.n_data, self.n_x)
+        else:
+            # Valid Monte Carlo Randomization Test includes observed tobs
+            # Generate one random permutation less
+            total = self.num_permutations - 1
+        if self.shard is not None and self.method == "Systematic":
+            first, total = get_shard_range(first, total, self.shard)
+        # A few blocks per job for load balancing, bounded by memory use
+        block_length = min(
+            self.block_size,
+            max(1, -(-(total - first) // (BLOCKS_PER_JOB * self.njobs))),
+        )
+        if self.method == "Systematic":
+            for start in range(first, total, block_length):
+                yield range(start, min(start + block_length, total))
+            return
+
+        # Random streams per block: block lengths must not depend on the
+        # number of jobs, nor on the number of metrics of RandTestMany.
+        # Sequential test: look early, then at doubling block lengths
+        block_length = min(
+            max(1, BLOCK_SIZE // max(1, self.n_data)),
+            RANDOM_BLOCK_LENGTH,
+        )
+        if self.method == "Sequential Monte Carlo":
+            block_length = self.block_size
+            length = min(SEQUENTIAL_BLOCK_LENGTH, block_length)
+        else:
+            length = block_length
+        num_drawn = 0
+        for stream in count():
+            if num_drawn >= total:
+                break
+            length = min(length, total - num_drawn)
+            if (self.shard is None or
+                    stream % self.shard.count == self.shard.index - 1):
+                yield RandomBlock(stream, length)
+            num_drawn += length
+            length = min(2 * length, block_length)
+
+    def _log_progress(self, num_drawn=0, final=False):
+        """Report progress, throttled by the progress reporter"""
+        if self.method == "Systematic":
+            num_permutations = self.num_permutations
+        else:
+            # Valid Monte Carlo Randomization Test includes observed tobs
+            num_permutations = num_drawn + 1
+        self.progress.update(
+            self.method,
+            int(self.num_successes),
+            num_permutations,
+            final,
+        )
+
+    def _get_random_indices(self, block):
+        """
+        Draw the (length, n_x) group A indices of a block of permutations
+        from its own random stream, spawned from the seed sequence
+        """
+        seed_sequence = np.random.SeedSequence(
+            self.seed_sequence.entropy,
+            spawn_key=self.seed_sequence.spawn_key + (block.stream,),
+        )
+        rng = np.random.default_rng(seed_sequence)
+        if self.strata is not None:
+            return draw_stratified(rng, self.strata, block.length)
+        indices = np.broadcast_to(
+            np.arange(self.n_data),
+            (block.length, self.n_data),
+        )
+        return rng.permuted(indices, axis=1)[:, :self.n_x]
+
+
+def _init_worker(rtest):
+    """Pool initializer: keep the RandTest instance in the worker"""
+    global _WORKER_RANDTEST
+    _WORKER_RANDTEST = rtest
+
+
+def _count_successes(block):
+    """Pool task: number of permutations and successes of a block"""
+    return _WORKER_RANDTEST.get_block_result(block)
+
+
+def _count_successes_of(token, payload, block):
+    """
+    Pool task of a persistent pool: number of permutations and successes
+    of a block of the pickled RandTest instance identified by token
+    """
+    global _WORKER_TOKEN, _WORKER_RANDTEST
+    if token != _WORKER_TOKEN:
+        if _WORKER_RANDTEST is not None:
+            _WORKER_RANDTEST.detach_arrays()
+        _WORKER_TOKEN, _WORKER_RANDTEST = token, pickle.loads(payload)
+    return _WORKER_RANDTEST.get_block_result(block)
 
 
 def test_statistic(
@@ -253,25 +1205,171 @@ def test_statistic(
     return mct(data_group_a) - mct(data_group_b)
 
 
-def check_random_state(seed):
+def get_seed_sequence(seed):
     """
-    Turn seed into a random.Random instance
-    If seed is None, return the Random singleton used by random.
-    If seed is an int, return a new Random instance seeded with seed.
-    If seed is already a Random instance, return it.
+    Turn seed into a numpy.random.SeedSequence
+    If seed is None, return a SeedSequence with fresh entropy.
+    If seed is an int, return SeedSequence(seed).
+    If seed is a random.Random instance, use 128 random bits as entropy.
+    If seed is already a SeedSequence instance, return it.
     Otherwise raise ValueError.
     """
-    # Code slightly adjusted from scikit-learn utils/validation.py
     if seed is None or isinstance(seed, int):
-        rng = random.Random(seed)
+        seed_sequence = np.random.SeedSequence(seed)
     elif isinstance(seed, random.Random):
-        rng = seed
+        seed_sequence = np.random.SeedSequence(seed.getrandbits(128))
+    elif isinstance(seed, np.random.SeedSequence):
+        seed_sequence = seed
     else:
         raise ValueError(
-            "### error: '{}' cannot be used to seed random.Random instance."
+            "### error: '{}' cannot be used to seed SeedSequence instance."
             .format(seed)
         )
-    return rng
+    return seed_sequence
+
+
+def is_batch_success(values, tobs, center, gamma, alternative):
+    """
+    Compare values of the vectorized engine with the observed value tobs.
+    For 'two_sided', distances to center (value of zero test statistic)
+    are compared. The tolerance gamma absorbs rounding differences between
+    permutations that yield the observed test statistic value.
+    Returns a boolean array.
+    """
+    if alternative == "two_sided":
+        hits = np.abs(values - center) >= np.abs(tobs - center) - gamma
+    elif alternative == "greater":
+        hits = values >= tobs - gamma
+    else:
+        hits = values <= tobs + gamma
+    return hits
+
+
+def get_batch_mct(mct):
+    """
+    Return the vectorized counterpart of a built-in MCT.
+    If mct is mean(), arithmetic_mean(), or mean_rank(), return
+    batch_arithmetic_mean().
+    If mct is statistics.median() or median(), return batch_median().
+    If mct is trimmed_mean() (possibly wrapped in functools.partial),
+    return batch_trimmed_mean() with the same parameters.
+    Otherwise return None.
+    """
+    if mct in (mean, arithmetic_mean, mean_rank):
+        return batch_arithmetic_mean
+    if mct in (statistics_median, median):
+        return batch_median
+    if mct is trimmed_mean:
+        return batch_trimmed_mean
+    if isinstance(mct, functools.partial) and mct.func is trimmed_mean:
+        return functools.partial(
+            batch_trimmed_mean,
+            *mct.args,
+            **mct.keywords,
+        )
+    return None
+
+
+def get_function_id(function) -> tuple:
+    """Identity of a (possibly partial) function that is stable across runs"""
+    if isinstance(function, functools.partial):
+        return (
+            get_function_id(function.func),
+            function.args,
+            tuple(sorted(function.keywords.items())),
+        )
+    return function.__module__, function.__qualname__
+
+
+def as_float_array(data):
+    """
+    Turn numerical data into a float64 numpy array.
+    Float64 arrays and buffers are used without copying.
+    Return None if data contain non-numerical items (e.g., Fraction), or
+    integers that float64 does not represent exactly (beyond 2**53).
+    """
+    data_array = np.asarray(data)
+    if data_array.dtype.kind not in "biuf":
+        return None
+    if (data_array.dtype.kind in "iu" and data_array.size and
+            max(-int(data_array.min()), int(data_array.max())) > 2 ** 53):
+        return None
+    return data_array.astype(float, copy=False)
+
+
+def as_data(data):
+    """
+    Turn the data of a group into a 1-D numpy array of numbers.
+    Inputs supporting the buffer protocol (e.g., numpy arrays,
+    array.array('d'), memoryviews) are used without copying, keeping
+    their item type. Other iterables are read once.
+    Return a tuple if data contain non-numerical items (e.g., Fraction).
+    """
+    try:
+        memoryview(data)
+    except TypeError:
+        data = tuple(data)
+    data_array = np.asarray(data)
+    if data_array.dtype.kind not in "biuf":
+        return tuple(data)
+    assert data_array.ndim == 1
+    return data_array
+
+
+def set_log_level(log_level):
+    """Configure logging with the given log level"""
+    log_levels = {
+        "debug": logging.DEBUG,
+        "info": logging.INFO,
+        "warn": logging.WARNING,
+        "error": logging.ERROR,
+        "critical": logging.CRITICAL,
+    }
+    logging.basicConfig(
+        level=log_levels.get(log_level, logging.WARNING),
+        format=(
+            "%(levelname)s :: " +
+            "%(name)s :: " +
+            "pid = %(process)d :: " +
+            "%(asctime)s :: " +
+            "%(message)s"
+        ),
+        #  datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+
+def get_num_jobs(num_jobs):
+    """
+    Turn num_jobs into the number of processes to be used.
+    If num_jobs > 0, use num_jobs processes (at most the number of cores).
+    If num_jobs < 0, use all cores but (-num_jobs - 1).
+    """
+    max_cores = mp.cpu_count()
+    if num_jobs > 0:
+        n_jobs = num_jobs
+        if num_jobs > max_cores:
+            logging.warning(
+                "Specified number of jobs (%d) is larger than the " +
+                "maximum number of cores (%d). " +
+                "Setting number of jobs to %d.",
+                num_jobs,
+                max_cores,
+                max_cores,
+            )
+            n_jobs = max_cores
+    else:
+        n_jobs = max_cores + num_jobs + 1
+        if n_jobs <= 0:
+            logging.warning(
+                "Specified number of jobs (%d) goes beyond " +
+                "the maximum number of cores (%d). " +
+                "Setting number of jobs to %d.",
+                num_jobs,
+                max_cores,
+                max_cores,
+            )
+            n_jobs = max_cores
+    return n_jobs
 
 
 def randtest(
@@ -283,14 +1381,29 @@ def randtest(
         alternative="two_sided",
         num_jobs=1,
         log_level="warn",
-        seed=None):
+        seed=None,
+        alpha=None,
+        tolerance=1e-3,
+        session=None,
+        progress=None,
+        cache=None,
+        profile=False,
+        checkpoint=None,
+        checkpoint_interval=60.,
+        shard=None,
+        strata_group_a=None,
+        strata_group_b=None):
     """
     Perform a randomization test with custom test statistic.
 
-    data_group_a : tuple
-        Data of group A.
+    data_group_a : iterable, buffer
+        Data of group A. Numerical data are stored as an array; buffers
+        (e.g., numpy arrays) are used without copying. The built-in
+        measures of central tendency use float64 data if integers are
+        represented exactly (up to 2**53), user-defined functions receive
+        Python numbers.
 
-    data_group_b : tuple
+    data_group_b : iterable, buffer
         Data of group B.
 
     mct : function
@@ -321,7 +1434,76 @@ def randtest(
         Possible values: 'debug', 'info', 'warn' (default), 'error',
         and 'critical'.
 
-    seed : None, int, random.Random() instance
+    seed : None, int, random.Random(), numpy.random.SeedSequence() instance
+        Each block of Monte Carlo permutations is drawn from its own
+        random stream spawned from the seed, such that the result for a
+        given seed does not depend on `num_jobs`.
+
+    alpha : None, float
+        Significance level of a sequential Monte Carlo randomization test.
+        If given, the Monte Carlo randomization test stops as soon as a
+        Clopper-Pearson confidence interval of the p value lies entirely
+        below or above `alpha`, using at most `num_permutations`.
+        Default: None, i.e., all `num_permutations` are generated.
+
+    tolerance : float
+        Probability that the sequential Monte Carlo randomization test
+        decides differently than a test with infinitely many permutations.
+        Default: 0.001.
+
+    session : None, RandTestSession
+        Session whose worker processes carry out the computation instead
+        of a new pool. If given, `num_jobs` is taken from the session.
+
+    progress : None, ProgressReporter
+        Reports the progress of the computation, e.g., to a callback.
+        Default: None, i.e., log the progress every second at INFO level.
+
+    cache : None, randtest.cache.DistributionCache
+        Cache of null distributions of systematic randomization tests with
+        the difference of built-in MCTs as test statistic. Repeated tests
+        on the same pooled data and group sizes, e.g. with another
+        `alternative`, then only look up the number of successes.
+        Default: None, i.e., no caching.
+
+    profile : bool
+        Record the wall and CPU times of the phases of the test (setup,
+        pool startup, sharing of the data, sampling of permutations,
+        statistic, whole run), the permutations per second, and the
+        number of blocks and permutations per worker in `timings`.
+        Default: False.
+
+    checkpoint : None, str
+        File name of a checkpoint of the test: the counters, the seed, and
+        the completed permutations (combination ranks or random streams)
+        are written to it every `checkpoint_interval` seconds and at the
+        end. If the file exists, the test resumes from it and yields the
+        same result as an uninterrupted test. Without `seed`, the seed of
+        the checkpoint is used.
+        Default: None, i.e., no checkpoints.
+
+    checkpoint_interval : float
+        Minimum number of seconds between checkpoints (default: 60).
+
+    shard : None, randtest.shards.Shard
+        Run only one shard of the permutations, e.g., as one job of a
+        batch scheduler, and write its partial result to `shard.fname`
+        (see merge_shards()). Systematic tests are split by ranges of
+        combination ranks, Monte Carlo tests by random streams; the latter
+        require a `seed` shared by all shards. Sharded tests do not use
+        the `cache`, and sequential tests (`alpha`) cannot be sharded.
+        Default: None, i.e., all permutations.
+
+    strata_group_a : None, iterable
+        Stratum labels (e.g., region and day) of the data of group A for
+        a stratified (blocked) randomization test: the data are permuted
+        within strata only. Systematic tests for the difference of means
+        convolve the exact distributions of the strata.
+        Default: None, i.e., all data are exchangeable.
+
+    strata_group_b : None, iterable
+        Stratum labels of the data of group B (required with
+        `strata_group_a`).
 
     Returns
     -------
@@ -349,15 +1531,20 @@ def randtest(
             larger than or equal to the observed test statistic value.
 
         num_permutations : int
-            Number of permutations.
+            Number of permutations. For the sequential Monte Carlo
+            randomization test, the number of permutations actually used.
 
         p_value : int
             The p value is equal to `num_successes / num_permutations`.
+
+        timings : dict, None
+            Timings of the test if `profile=True`, otherwise None.
+
+        For a shard, `num_successes` and `num_permutations` are the counts
+        of the shard only (Monte Carlo: without the observed permutation).
     """
-    if not isinstance(data_group_a, tuple):
-        data_group_a = tuple(data_group_a)
-    if not isinstance(data_group_b, tuple):
-        data_group_b = tuple(data_group_b)
+    data_group_a = as_data(data_group_a)
+    data_group_b = as_data(data_group_b)
     assert isinstance(mct, (FunctionType, functools.partial))
     assert isinstance(tstat, FunctionType)
     assert isinstance(num_permutations, int) and num_permutations != 0
@@ -368,54 +1555,21 @@ def randtest(
         alternative in ["two_sided", "greater", "less"]
     )
     assert isinstance(num_jobs, int) and num_jobs != 0
+    assert alpha is None or 0 < alpha < 1
+    assert 0 < tolerance < 1
     assert (
         isinstance(log_level, str) and
         log_level in ["debug", "info", "warn", "error", "critical"]
     )
-    log_levels = {
-        "debug": logging.DEBUG,
-        "info": logging.INFO,
-        "warn": logging.WARNING,
-        "error": logging.ERROR,
-        "critical": logging.CRITICAL,
-    }
-    logging.basicConfig(
-        level=log_levels.get(log_level, logging.WARNING),
-        format=(
-            "%(levelname)s :: " +
-            "%(name)s :: " +
-            "pid = %(process)d :: " +
-            "%(asctime)s :: " +
-            "%(message)s"
-        ),
-        #  datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
-    max_cores = mp.cpu_count()
-    if num_jobs > 0:
-        n_jobs = num_jobs
-        if num_jobs > max_cores:
-            logging.warning(
-                "Specified number of jobs (%d) is larger than the " +
-                "maximum number of cores (%d). " +
-                "Setting number of jobs to %d.",
-                num_jobs,
-                max_cores,
-                max_cores,
-            )
-            n_jobs = max_cores
-    else:
-        n_jobs = max_cores + num_jobs + 1
-        if n_jobs <= 0:
-            logging.warning(
-                "Specified number of jobs (%d) goes beyond " +
-                "the maximum number of cores (%d). " +
-                "Setting number of jobs to %d.",
-                num_jobs,
-                max_cores,
-                max_cores,
-            )
-            n_jobs = max_cores
+    set_log_level(log_level)
+    n_jobs = get_num_jobs(num_jobs) if session is None else session.njobs
+    strata = None
+    if strata_group_a is not None or strata_group_b is not None:
+        strata_group_a = tuple(strata_group_a)
+        strata_group_b = tuple(strata_group_b)
+        assert len(strata_group_a) == len(data_group_a)
+        assert len(strata_group_b) == len(data_group_b)
+        strata = strata_group_a + strata_group_b
 
     rtest = RandTest(
         data_group_a,
@@ -426,15 +1580,106 @@ def randtest(
         alternative,
         n_jobs,
         seed,
+        alpha,
+        tolerance,
+        progress,
+        cache,
+        profile,
+        checkpoint,
+        checkpoint_interval,
+        shard,
+        strata,
     )
-    rtest.run()
+    if shard is not None and rtest.method != "Systematic":
+        if seed is None:
+            raise ValueError(
+                "### error: sharded Monte Carlo tests require a seed."
+            )
+        if alpha is not None:
+            raise ValueError("### error: sequential tests cannot be sharded.")
+    rtest.run(None if session is None else session.pool)
+    # Rank statistics: MCTs of the ranks. User-defined functions: Python
+    # numbers, as for the test statistic
+    data = rtest.data if rtest.batch_mct is not None else rtest._get_items()
+    mcta = mct(data[:rtest.n_x])
+    mctb = mct(data[rtest.n_x:])
+    if shard is not None:
+        num_successes = rtest.num_successes
+        if rtest.method != "Systematic":
+            # Without the observed tobs (added by merge_shards())
+            num_successes -= 1
+        write_shard(shard, {
+            "key": rtest.test_key,
+            "method": rtest.method,
+            "alternative": rtest.alternative,
+            "mcta": float(mcta),
+            "mctb": float(mctb),
+            "statistic": float(rtest.tobs),
+            "num_successes": int(num_successes),
+            "num_permutations": rtest.num_drawn,
+            "entropy": rtest.seed_sequence.entropy,
+            "spawn_key": list(rtest.seed_sequence.spawn_key),
+        })
+        return RandTestResult(
+            rtest.method,
+            rtest.alternative,
+            mcta,
+            mctb,
+            rtest.tobs,
+            int(num_successes),
+            rtest.num_drawn,
+            seed,
+            rtest.timings,
+        )
+    # Resumed tests without seed: seed of the checkpoint
+    if seed is None and checkpoint is not None:
+        seed = rtest.seed_sequence
     return RandTestResult(
         rtest.method,
         rtest.alternative,
-        mct(data_group_a),
-        mct(data_group_b),
+        mcta,
+        mctb,
         rtest.tobs,
         rtest.num_successes,
         rtest.num_permutations,
         seed,
+        rtest.timings,
+    )
+
+
+def merge_shards(fnames) -> RandTestResult:
+    """
+    Combine the partial results of all shards of a randomization test
+    (see the `shard` parameter of randtest()) into one RandTestResult,
+    equal to the result of the unsharded test. The measures of central
+    tendency and the test statistic are those of the partial results.
+
+    fnames : iterable
+        File names of the partial results of all shards.
+    """
+    states = read_shards(fnames)
+    first = states[0]
+    num_successes = sum(state["num_successes"] for state in states)
+    num_permutations = sum(state["num_permutations"] for state in states)
+    if first["method"] != "Systematic":
+        # Valid Monte Carlo Randomization Test includes observed tobs
+        num_successes += 1
+        num_permutations += 1
+    seed = (
+        np.random.SeedSequence(
+            first["entropy"],
+            spawn_key=tuple(first["spawn_key"]),
+        )
+        if first["spawn_key"] else
+        first["entropy"]
+    )
+    return RandTestResult(
+        first["method"],
+        first["alternative"],
+        first["mcta"],
+        first["mctb"],
+        first["statistic"],
+        num_successes,
+        num_permutations,
+        seed,
     )
@@ -0,0 +1,207 @@
+"""
+Module: cache
+
+Implements a cache of null distributions of systematic randomization
+tests. The distribution of the values compared with the observed one
+(sums of group A or test statistic values) over all data permutations
+only depends on the pooled data as a multiset, the group sizes, and the
+statistic. It is kept as sorted distinct values with cumulative counts,
+such that the number of successes for any alternative is found by binary
+search in O(log N) instead of re-enumerating the permutations.
+"""
+
+import os
+import hashlib
+import zipfile
+from collections import OrderedDict, namedtuple
+import numpy as np
+
+
+NullDistribution = namedtuple(
+    "NullDistribution",
+    ["values", "cumulative_counts"],
+)
+NullDistribution.__doc__ = """
+Null distribution of a systematic randomization test
+
+    values : numpy.ndarray
+        Distinct values in increasing order.
+
+    cumulative_counts : numpy.ndarray
+        Number of data permutations with a value less than or equal to
+        the value at the same index.
+"""
+
+
+def make_null_distribution(values, counts=None) -> NullDistribution:
+    """
+    Null distribution of values (each with the number of data permutations
+    in counts, default: one each). Values with zero counts are dropped.
+    """
+    values = np.asarray(values)
+    if counts is None:
+        values, counts = np.unique(values, return_counts=True)
+    else:
+        order = np.argsort(values, kind="stable")
+        values, counts = values[order], np.asarray(counts)[order]
+        nonzero = counts != 0
+        values, counts = values[nonzero], counts[nonzero]
+    return NullDistribution(values, np.cumsum(counts))
+
+
+def count_outside(distribution: NullDistribution, lower, upper) -> int:
+    """
+    Number of data permutations with a value <= lower or >= upper
+    (each permutation counted once), by binary search
+    """
+    values, cumulative_counts = distribution
+    total = cumulative_counts[-1]
+    if upper <= lower:
+        return int(total)
+    index = np.searchsorted(values, lower, side="right")
+    num_lower = cumulative_counts[index - 1] if index else 0
+    index = np.searchsorted(values, upper, side="left")
+    num_upper = total - (cumulative_counts[index - 1] if index else 0)
+    return int(num_lower + num_upper)
+
+
+def get_cache_key(*parts) -> str:
+    """Hash of the parts (bytes, or objects by their repr)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = repr(part).encode()
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def to_savable(array) -> np.ndarray:
+    """
+    Array that is saved without pickle: the Python int counts of exact
+    distributions (object arrays, possibly beyond int64) as decimal strings
+    """
+    array = np.asarray(array)
+    if array.dtype == object:
+        return array.astype(str)
+    return array
+
+
+def from_savable(array) -> np.ndarray:
+    """Inverse of to_savable(): decimal strings as Python int counts"""
+    if array.dtype.kind == "U":
+        return np.array([int(value) for value in array.tolist()], dtype=object)
+    return array
+
+
+class DistributionCache:
+    """
+    DistributionCache Class
+
+    Least recently used (LRU) cache of null distributions in memory and,
+    optionally, on disk (NumPy .npz files, read without pickle).
+
+    Parameters
+    ----------
+        maxsize : int
+            Maximum number of null distributions kept in memory
+            (default: 32).
+
+        directory : None, str
+            Directory of the on-disk cache (created if needed).
+            Default: None, i.e., in memory only.
+
+        max_files : int
+            Maximum number of null distributions kept on disk
+            (default: 1024).
+
+    Example
+    -------
+    >>> cache = DistributionCache(directory=".randtest_cache")
+    >>> for alternative in ["two_sided", "greater", "less"]:
+    ...     randtest(x, y, num_permutations=-1, alternative=alternative,
+    ...              cache=cache)
+    """
+    def __init__(self, maxsize=32, directory=None, max_files=1024):
+        assert isinstance(maxsize, int) and maxsize > 0
+        assert isinstance(max_files, int) and max_files > 0
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_files = max_files
+        self.distributions = OrderedDict()
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, key: str):
+        """Null distribution of key, or None if not cached"""
+        if key in self.distributions:
+            self.distributions.move_to_end(key)
+            return self.distributions[key]
+        if self.directory is None:
+            return None
+        fname = self._get_fname(key)
+        try:
+            # Arrays only: loading never unpickles (executes) objects
+            with np.load(fname, allow_pickle=False) as arrays:
+                distribution = NullDistribution(*(
+                    from_savable(arrays[field])
+                    for field in NullDistribution._fields
+                ))
+        except (OSError, ValueError, KeyError, TypeError, zipfile.BadZipFile):
+            return None
+        # Recently used files are evicted last
+        os.utime(fname)
+        self._put_memory(key, distribution)
+        return distribution
+
+    def put(self, key: str, distribution: NullDistribution):
+        """Cache the null distribution of key"""
+        self._put_memory(key, distribution)
+        if self.directory is None:
+            return
+        fname = self._get_fname(key)
+        # Write and rename: readers never see partially written files
+        fname_tmp = "{}.{}.tmp".format(fname, os.getpid())
+        with open(fname_tmp, "wb") as fobj:
+            np.savez(fobj, **{
+                field: to_savable(array)
+                for field, array in distribution._asdict().items()
+            })
+        os.replace(fname_tmp, fname)
+        self._evict_files()
+
+    def clear(self):
+        """Remove all null distributions from memory and disk"""
+        self.distributions.clear()
+        if self.directory is None:
+            return
+        for fname in self._get_fnames():
+            os.remove(fname)
+
+    def _put_memory(self, key, distribution):
+        """Cache in memory, evicting the least recently used"""
+        self.distributions[key] = distribution
+        self.distributions.move_to_end(key)
+        while len(self.distributions) > self.maxsize:
+            self.distributions.popitem(last=False)
+
+    def _get_fname(self, key):
+        """File name of the null distribution of key"""
+        return os.path.join(self.directory, key + ".npz")
+
+    def _get_fnames(self):
+        """File names of the null distributions on disk"""
+        return [
+            os.path.join(self.directory, fname)
+            for fname in os.listdir(self.directory)
+            if fname.endswith(".npz")
+        ]
+
+    def _evict_files(self):
+        """Remove the least recently used files beyond max_files"""
+        fnames = self._get_fnames()
+        if len(fnames) <= self.max_files:
+            return
+        fnames.sort(key=os.path.getmtime)
+        for fname in fnames[:len(fnames) - self.max_files]:
+            os.remove(fname)
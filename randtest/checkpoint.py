@@ -0,0 +1,99 @@
+"""
+Module: checkpoint
+
+Implements checkpoints of long-running randomization tests. The blocks of
+permutations are deterministic: systematic blocks are ranges of
+combination ranks, and Monte Carlo blocks are drawn from random streams
+identified by their index, spawned from the seed. Hence, the state of a
+test consists of its counters, the seed, and the completed positions
+(ranks or stream indices) as intervals. A resumed test skips the
+completed positions and yields the same result as an uninterrupted one.
+"""
+
+import os
+import json
+from time import perf_counter
+
+
+class Checkpoint:
+    """
+    Checkpoint Class
+
+    State of a randomization test in a JSON file, written at most every
+    `interval` seconds and at the end of the test.
+
+    Parameters
+    ----------
+        fname : str
+            File name of the checkpoint.
+
+        interval : float
+            Minimum number of seconds between writes (default: 60).
+    """
+    def __init__(self, fname, interval=60.):
+        self.fname = fname
+        self.interval = interval
+        self._last_time = perf_counter()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_last_time"] = 0.
+        return state
+
+    def load(self, key: str):
+        """
+        State of the test identified by key, or None if there is no
+        checkpoint file yet. Raise ValueError if the file belongs to
+        another test.
+        """
+        if not os.path.exists(self.fname):
+            return None
+        with open(self.fname, "r") as fobj:
+            state = json.load(fobj)
+        if state.get("key") != key:
+            raise ValueError(
+                "### error: checkpoint '{}' belongs to another test."
+                .format(self.fname)
+            )
+        self._last_time = perf_counter()
+        return state
+
+    def is_due(self) -> bool:
+        """Whether the interval since the last write has passed"""
+        return perf_counter() - self._last_time >= self.interval
+
+    def save(self, state: dict):
+        """Write the state (atomically: write and rename)"""
+        fname_tmp = "{}.{}.tmp".format(self.fname, os.getpid())
+        with open(fname_tmp, "w") as fobj:
+            json.dump(state, fobj)
+        os.replace(fname_tmp, self.fname)
+        self._last_time = perf_counter()
+
+
+def add_interval(intervals: list, start: int, stop: int) -> list:
+    """
+    Add [start, stop) to sorted, disjoint intervals [[start, stop], ...],
+    merging adjacent and overlapping ones. Returns the new list.
+    """
+    merged = []
+    for interval_start, interval_stop in sorted(intervals + [[start, stop]]):
+        if merged and interval_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], interval_stop)
+        else:
+            merged.append([interval_start, interval_stop])
+    return merged
+
+
+def subtract_intervals(start: int, stop: int, intervals: list):
+    """Generate the ranges of [start, stop) not covered by intervals"""
+    for interval_start, interval_stop in intervals:
+        if interval_stop <= start:
+            continue
+        if interval_start >= stop:
+            break
+        if interval_start > start:
+            yield range(start, interval_start)
+        start = max(start, interval_stop)
+    if start < stop:
+        yield range(start, stop)
@@ -0,0 +1,147 @@
+"""
+Module:
+Combinatorial helpers for the enumeration of data permutations
+
+Combinations are ranked in lexicographic order, i.e., the same order in
+which itertools.combinations() generates them, or in revolving door
+order. This allows splitting the permutations of a systematic
+randomization test into rank ranges.
+"""
+
+
+def binomial(n: int, k: int) -> int:
+    """Binomial coefficient: number of k-combinations of n items"""
+    if k < 0 or k > n:
+        return 0
+    k = min(k, n - k)
+    result = 1
+    for i in range(1, k + 1):
+        result = result * (n - k + i) // i
+    return result
+
+
+def unrank_combination(rank: int, n: int, k: int) -> tuple:
+    """k-combination of range(n) with given lexicographic rank"""
+    assert 0 <= rank < binomial(n, k)
+    combination = []
+    candidate = 0
+    for i in range(k):
+        while True:
+            num_following = binomial(n - candidate - 1, k - i - 1)
+            if rank < num_following:
+                break
+            rank -= num_following
+            candidate += 1
+        combination.append(candidate)
+        candidate += 1
+    return tuple(combination)
+
+
+def iter_combinations(n: int, k: int, start=0, stop=None):
+    """
+    Generate the k-combinations of range(n) with lexicographic ranks in
+    [start, stop). If stop is None, generate up to the last combination.
+    """
+    if stop is None:
+        stop = binomial(n, k)
+    if start >= stop:
+        return
+    indices = list(unrank_combination(start, n, k))
+    yield tuple(indices)
+    for _ in range(stop - start - 1):
+        i = k - 1
+        while indices[i] == i + n - k:
+            i -= 1
+        indices[i] += 1
+        for j in range(i + 1, k):
+            indices[j] = indices[j - 1] + 1
+        yield tuple(indices)
+
+
+# Revolving door order (minimal change order): consecutive combinations
+# differ by one swapped element. It is defined recursively as
+#   R(n, k) = R(n - 1, k), reversed(R(n - 1, k - 1)) + {n - 1}
+# (see D. L. Kreher and D. R. Stinson, Combinatorial Algorithms:
+# Generation, Enumeration, and Search. Boca Raton, FL: CRC Press, 1999.)
+
+
+def rank_revolving_door(combination, n: int) -> int:
+    """Rank of a k-combination of range(n) in revolving door order"""
+    members = set(combination)
+    k = len(members)
+    rank, sign = 0, 1
+    for item in range(n - 1, -1, -1):
+        if k == 0:
+            break
+        if item in members:
+            rank += sign * (binomial(item + 1, k) - 1)
+            sign = -sign
+            k -= 1
+    return rank
+
+
+def unrank_revolving_door(rank: int, n: int, k: int) -> tuple:
+    """k-combination of range(n) with given revolving door rank"""
+    assert 0 <= rank < binomial(n, k)
+    combination = []
+    while k > 0:
+        if rank >= binomial(n - 1, k):
+            combination.append(n - 1)
+            rank = binomial(n, k) - 1 - rank
+            k -= 1
+        n -= 1
+    return tuple(reversed(combination))
+
+
+def revolving_door_successor(combination: list, n: int) -> tuple:
+    """
+    Turn a sorted k-combination (list) of range(n) into its successor in
+    revolving door order in place. Returns the removed and added element.
+    """
+    k = len(combination)
+    q = 0
+    while q < k and combination[q] == q:
+        q += 1
+    if (k - q) % 2 == 0:
+        if q == 0:
+            removed = combination[0]
+            combination[0] -= 1
+            return removed, removed - 1
+        combination[q - 1] = q
+        if q == 1:
+            return 0, 1
+        combination[q - 2] = q - 1
+        return q - 2, q
+    following = combination[q + 1] if q + 1 < k else n
+    if following != combination[q] + 1:
+        added = combination[q] + 1
+        if q == 0:
+            removed = combination[0]
+        else:
+            removed = combination[q - 1]
+            combination[q - 1] = combination[q]
+        combination[q] = added
+        return removed, added
+    if q + 1 < k:
+        removed = combination[q + 1]
+        combination[q + 1] = combination[q]
+    else:
+        removed = combination[q]
+    combination[q] = q
+    return removed, q
+
+
+def iter_revolving_door(n: int, k: int, start=0, stop=None):
+    """
+    Generate the k-combinations of range(n) with revolving door ranks in
+    [start, stop). If stop is None, generate up to the last combination.
+    """
+    if stop is None:
+        stop = binomial(n, k)
+    if start >= stop:
+        return
+    combination = list(unrank_revolving_door(start, n, k))
+    yield tuple(combination)
+    for _ in range(stop - start - 1):
+        revolving_door_successor(combination, n)
+        yield tuple(combination)
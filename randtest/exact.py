@@ -0,0 +1,155 @@
+"""
+Module:
+Exact permutation distribution of the sum of group A
+
+For integer-valued (or discretizable) data, the number of data
+permutations yielding each sum of group A is counted by dynamic
+programming over the data points instead of enumerating combinations.
+As the difference between arithmetic means is increasing in the sum of
+group A, this yields the exact systematic randomization test for the mean
+in polynomial time.
+"""
+
+from fractions import Fraction
+from functools import lru_cache
+from math import gcd, isfinite
+from numbers import Integral, Rational, Real
+import numpy as np
+
+
+# Upper bound on the size of the dynamic programming table
+MAX_CELLS = 10 ** 7
+
+# Number of exact rank-sum distributions kept in memory
+RANK_CACHE_SIZE = 128
+
+
+def discretize(data):
+    """
+    Map data onto nonnegative integers on a common grid.
+    Each data point is written as a fraction (floats by their shortest
+    decimal representation), shifted by the minimum and divided by the
+    grid width, such that sums of equally sized groups are ordered and
+    tied exactly as the sums of the original data.
+    Return None if data are not numerical.
+    """
+    fractions = []
+    for item in data:
+        if isinstance(item, (Integral, np.integer)):
+            fractions.append(Fraction(int(item)))
+        elif isinstance(item, Rational):
+            fractions.append(Fraction(item.numerator, item.denominator))
+        elif isinstance(item, (Real, np.floating)) and isfinite(item):
+            fractions.append(Fraction(str(float(item))))
+        else:
+            return None
+    if not fractions:
+        return ()
+    minimum = min(fractions)
+    shifted = [item - minimum for item in fractions]
+    denominator = 1
+    for item in shifted:
+        denominator = (
+            denominator * item.denominator //
+            gcd(denominator, item.denominator)
+        )
+    values = [int(item * denominator) for item in shifted]
+    divisor = 0
+    for value in values:
+        divisor = gcd(divisor, value)
+    if divisor > 1:
+        values = [value // divisor for value in values]
+    return tuple(values)
+
+
+def num_cells(values, k: int) -> int:
+    """Size of the table used by subset_sum_counts(values, k)"""
+    k = min(k, len(values) - k)
+    return (k + 1) * (sum(sorted(values, reverse=True)[:k]) + 1)
+
+
+def subset_sum_counts(values, k: int) -> np.ndarray:
+    """
+    Count the k-subsets of nonnegative integer values by their sum.
+    Returns an object array of Python int counts, where the entry at
+    index s is the number of k-subsets with sum s.
+    """
+    num_values = len(values)
+    total = sum(values)
+    if 2 * k > num_values:
+        # Count the complements instead: sum(A) = total - sum(B)
+        return subset_sum_counts(values, num_values - k)[::-1].copy()
+
+    max_sum = sum(sorted(values, reverse=True)[:k])
+    counts = np.zeros((k + 1, max_sum + 1), dtype=object)
+    counts[0, 0] = 1
+    for i, value in enumerate(values):
+        # Only subset sizes that can still be completed to size k
+        lowest = max(1, k - (num_values - i - 1))
+        for j in range(min(i + 1, k), lowest - 1, -1):
+            if value == 0:
+                counts[j] += counts[j - 1]
+            elif value <= max_sum:
+                counts[j, value:] += counts[j - 1, :max_sum + 1 - value]
+
+    result = np.zeros(total + 1, dtype=object)
+    result[:max_sum + 1] = counts[k]
+    return result
+
+
+@lru_cache(maxsize=RANK_CACHE_SIZE)
+def rank_sum_counts(k: int, ties: tuple) -> np.ndarray:
+    """
+    Count the k-subsets of the discretized midranks of pooled data with the
+    tie pattern ties (sizes of the groups of tied items) by their sum.
+    The result only depends on k, the number of data points, and the tie
+    pattern, so it is cached. Equal to subset_sum_counts(values, k), where
+    values are the discretized midranks; the result must not be modified.
+    """
+    ranks = []
+    upper = 0
+    for size in ties:
+        upper += size
+        # Midrank: highest rank of the group minus half the group width
+        ranks.extend([Fraction(2 * upper - size + 1, 2)] * size)
+    return subset_sum_counts(discretize(ranks), k)
+
+
+def convolve_counts(counts_a: np.ndarray, counts_b: np.ndarray) -> np.ndarray:
+    """
+    Counts of the sums of two independent parts (object arrays of Python
+    int counts by sum): one shifted copy of the longer array per nonzero
+    count of the shorter one
+    """
+    if len(counts_a) < len(counts_b):
+        counts_a, counts_b = counts_b, counts_a
+    result = np.zeros(len(counts_a) + len(counts_b) - 1, dtype=object)
+    for shift in np.flatnonzero(counts_b != 0):
+        result[shift:shift + len(counts_a)] += counts_b[shift] * counts_a
+    return result
+
+
+def stratified_num_cells(values_per_stratum, ks) -> int:
+    """
+    Size of the tables and convolutions used by
+    stratified_sum_counts(values_per_stratum, ks)
+    """
+    cells = 0
+    length = 1
+    for values, k in zip(values_per_stratum, ks):
+        cells += num_cells(values, k) + length * (sum(values) + 1)
+        length += sum(values)
+    return cells
+
+
+def stratified_sum_counts(values_per_stratum, ks) -> np.ndarray:
+    """
+    Count the permutations within strata by the sum of group A: the
+    convolution of the counts of the k-subsets of each stratum by their
+    sum (see subset_sum_counts()), as the strata are permuted
+    independently
+    """
+    counts = np.ones(1, dtype=object)
+    for values, k in zip(values_per_stratum, ks):
+        counts = convolve_counts(counts, subset_sum_counts(values, k))
+    return counts
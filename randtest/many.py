@@ -0,0 +1,262 @@
+"""
+Module: randtest_many
+
+Implements randomization tests for many metrics measured on the same
+experimental units. All metrics share one set of data permutations, which
+is evaluated for all metrics at once by the vectorized engine.
+"""
+
+from statistics import mean
+import numpy as np
+from .base import (
+    BLOCK_SIZE,
+    RandTest,
+    RandTestResult,
+    get_batch_mct,
+    RandomBlock,
+    get_num_jobs,
+    is_batch_success,
+    set_log_level,
+    test_statistic,
+)
+from .mcts import batch_arithmetic_mean, mean_rank, midranks
+
+
+class RandTestMany(RandTest):
+    """
+    RandTestMany Class
+
+    Carries out the computation of randomization tests for many metrics
+    (rows of the data) with shared data permutations. The scheduling of
+    the blocks of permutations is inherited from RandTest.
+    """
+    def __init__(self,
+                 data_group_a,
+                 data_group_b,
+                 batch_mct,
+                 num_permutations,
+                 alternative,
+                 n_jobs,
+                 seed,
+                 progress=None):
+        self._init_test(
+            num_permutations,
+            alternative,
+            n_jobs,
+            seed,
+            progress=progress,
+        )
+        # Metrics are only compared by the vectorized engine
+        self.mct = None
+        self.tstat = test_statistic
+        self.batch_mct = batch_mct
+        self._init_data(
+            np.concatenate([data_group_a, data_group_b], axis=1),
+            data_group_a.shape[1],
+        )
+        self.n_metrics = self.data.shape[0]
+
+        self.sum_statistic = self.batch_mct is batch_arithmetic_mean
+        self.batch_tobs = self._compute_batch_values(
+            np.arange(self.n_x)[np.newaxis, :]
+        )
+        if self.sum_statistic:
+            self.batch_center = (
+                self.data.sum(axis=1, keepdims=True) * self.n_x / self.n_data
+            )
+            scale = np.abs(self.data).sum(axis=1, keepdims=True)
+        else:
+            self.batch_center = np.zeros((self.n_metrics, 1))
+            scale = np.abs(self.data).max(axis=1, keepdims=True, initial=0.)
+        self.batch_gamma = scale * np.finfo(float).eps * 100
+        self.block_size = max(
+            1,
+            BLOCK_SIZE // max(1, self.n_metrics * self.n_data),
+        )
+
+        self.mirror = (
+            self.method == "Systematic" and
+            2 * self.n_x == self.n_data > 0
+        )
+        self.num_successes = np.zeros(self.n_metrics, dtype=int)
+
+    def count_successes(self, block) -> tuple:
+        """
+        Compute the number of successes per metric of a block of
+        permutations. The random streams are those of RandTest, whose
+        blocks are evaluated in chunks of `block_size` permutations to
+        bound the memory use of many metrics.
+        """
+        if isinstance(block, RandomBlock):
+            block = self._get_random_indices(block)
+        if isinstance(block, range) or len(block) <= self.block_size:
+            return super().count_successes(block)
+        num_successes = 0
+        for start in range(0, len(block), self.block_size):
+            num_successes = num_successes + super().count_successes(
+                block[start:start + self.block_size]
+            )[1]
+        return len(block), num_successes
+
+    def _log_progress(self, num_drawn=0, final=False):
+        """Report the progress of the metric with the fewest successes"""
+        if self.method == "Systematic":
+            num_permutations = self.num_permutations
+        else:
+            # Valid Monte Carlo Randomization Test includes observed tobs
+            num_permutations = num_drawn + 1
+        self.progress.update(
+            self.method,
+            int(np.min(self.num_successes)),
+            num_permutations,
+            final,
+        )
+
+    def _compute_batch_values(self, idx_group_a):
+        """
+        Values of a (n_batch, n_x) index matrix for all metrics, shape
+        (n_metrics, n_batch): the sums of group A for the difference of
+        means, otherwise the test statistics
+        """
+        n_batch = idx_group_a.shape[0]
+        mask = np.zeros((n_batch, self.n_data), dtype=bool)
+        mask[np.arange(n_batch)[:, np.newaxis], idx_group_a] = True
+        if self.sum_statistic:
+            return self.data @ mask.T.astype(float)
+        data = np.broadcast_to(
+            self.data[:, np.newaxis, :],
+            (self.n_metrics, n_batch, self.n_data),
+        )
+        data_group_a = data[:, mask].reshape(-1, self.n_x)
+        data_group_b = data[:, ~mask].reshape(-1, self.n_data - self.n_x)
+        tvals = self.batch_mct(data_group_a) - self.batch_mct(data_group_b)
+        return tvals.reshape(self.n_metrics, n_batch)
+
+    def _count_batch_successes(self, values):
+        """Number of successes per metric"""
+        hits = is_batch_success(
+            values,
+            self.batch_tobs,
+            self.batch_center,
+            self.batch_gamma,
+            self.alternative,
+        )
+        return np.count_nonzero(hits, axis=1)
+
+
+def randtest_many(
+        data_group_a,
+        data_group_b,
+        mct=mean,
+        num_permutations=10000,
+        alternative="two_sided",
+        num_jobs=1,
+        log_level="warn",
+        seed=None,
+        session=None,
+        progress=None):
+    """
+    Perform randomization tests for many metrics with shared permutations.
+
+    data_group_a : 2-D array-like
+        Data of group A: one row per metric, one column per unit.
+
+    data_group_b : 2-D array-like
+        Data of group B: one row per metric, one column per unit.
+
+    mct : function
+        Measure of central tendency to be computed in the test statistic,
+        i.e., the difference between the mcts of the two groups.
+        Possible values: mean() (default), randtest.mcts.arithmetic_mean(),
+        randtest.mcts.trimmed_mean() (possibly via functools.partial),
+        statistics.median(), randtest.mcts.median(), and
+        randtest.mcts.mean_rank() (ranks the data of each metric).
+
+    num_permutations : int
+        Number of permutations to be carried out for the randomization tests.
+        If `num_permutations > 0`, Monte Carlo randomization tests are
+        performed, otherwise (`num_permutations = -1`) systematic ones.
+
+    alternative : str
+        Alternative hypothesis.
+        Possible values: 'two_sided' (default), 'greater', and 'less'.
+
+    num_jobs : int
+        Number of jobs to carry out the computation.
+
+    log_level : str
+        Set log level.
+        Possible values: 'debug', 'info', 'warn' (default), 'error',
+        and 'critical'.
+
+    seed : None, int, random.Random(), numpy.random.SeedSequence() instance
+
+    session : None, RandTestSession
+        Session whose worker processes carry out the computation instead
+        of a new pool. If given, `num_jobs` is taken from the session.
+
+    progress : None, ProgressReporter
+        Reports the progress of the computation (smallest number of
+        successes over all metrics). Default: None, i.e., log the progress
+        every second at INFO level.
+
+    Returns
+    -------
+    List of RandTestResult objects, one per metric. The result of a metric
+    is the same as the one of randtest() with the same seed.
+    """
+    data_group_a = np.asarray(data_group_a, dtype=float)
+    data_group_b = np.asarray(data_group_b, dtype=float)
+    assert data_group_a.ndim == 2 and data_group_b.ndim == 2
+    assert data_group_a.shape[0] == data_group_b.shape[0]
+    if mct is mean_rank:
+        # Rank the pooled data of each metric once
+        n_a = data_group_a.shape[1]
+        ranks = np.array([
+            midranks(row)[0]
+            for row in np.concatenate([data_group_a, data_group_b], axis=1)
+        ]).reshape(data_group_a.shape[0], -1)
+        data_group_a, data_group_b = ranks[:, :n_a], ranks[:, n_a:]
+    batch_mct = get_batch_mct(mct)
+    assert batch_mct is not None
+    assert isinstance(num_permutations, int) and num_permutations != 0
+    if num_permutations < 0:
+        assert num_permutations == -1
+    assert (
+        isinstance(alternative, str) and
+        alternative in ["two_sided", "greater", "less"]
+    )
+    assert isinstance(num_jobs, int) and num_jobs != 0
+    assert (
+        isinstance(log_level, str) and
+        log_level in ["debug", "info", "warn", "error", "critical"]
+    )
+    set_log_level(log_level)
+    n_jobs = get_num_jobs(num_jobs) if session is None else session.njobs
+
+    rtest = RandTestMany(
+        data_group_a,
+        data_group_b,
+        batch_mct,
+        num_permutations,
+        alternative,
+        n_jobs,
+        seed,
+        progress,
+    )
+    rtest.run(None if session is None else session.pool)
+    results = []
+    for metric, num_successes in enumerate(rtest.num_successes):
+        metric_group_a = tuple(data_group_a[metric].tolist())
+        metric_group_b = tuple(data_group_b[metric].tolist())
+        results.append(RandTestResult(
+            rtest.method,
+            rtest.alternative,
+            mct(metric_group_a),
+            mct(metric_group_b),
+            test_statistic(metric_group_a, metric_group_b, mct),
+            int(num_successes),
+            rtest.num_permutations,
+            seed,
+        ))
+    return results
@@ -4,6 +4,11 @@ Collection of functions for various measures of central tendencies
 """
 
 from types import GeneratorType
+import numpy as np
+
+
+# Minimum number of data points for selection instead of sorting
+SELECTION_MIN_SIZE = 4096
 
 
 def arithmetic_mean(data: GeneratorType) -> float:
@@ -17,9 +22,99 @@ def arithmetic_mean(data: GeneratorType) -> float:
 
 def trimmed_mean(data: GeneratorType, trim_percent=.2) -> float:
     """Trimmed mean computed on generator object"""
-    data_sorted = tuple(sorted(data))
-    num_data_pnts = len(data_sorted)
+    if isinstance(data, np.ndarray):
+        data_array = data
+    else:
+        data = list(data)
+        data_array = (
+            np.asarray(data)
+            if len(data) >= SELECTION_MIN_SIZE else
+            None
+        )
+    num_data_pnts = len(data)
+    lowercut = int(num_data_pnts * trim_percent)
+    uppercut = num_data_pnts - lowercut
+    if data_array is None or data_array.dtype.kind not in "biuf":
+        # Small data or non-numerical items (e.g., Fraction): sorting
+        # Python objects is faster (and exact)
+        data_trimmed = sorted(data)[lowercut:uppercut]
+        return sum(data_trimmed) / len(data_trimmed)
+    data_trimmed = _select_trimmed(data_array, lowercut, uppercut)
+    return data_trimmed.sum() / len(data_trimmed)
+
+
+def _select_trimmed(data: np.ndarray, lowercut: int, uppercut: int):
+    """
+    Items of rank lowercut to uppercut - 1 along the last axis (in any
+    order). Large data: O(n) selection of the two cut points instead of
+    sorting. Small data: NumPy's (vectorized) sort is faster.
+    """
+    if data.shape[-1] < SELECTION_MIN_SIZE or uppercut <= lowercut:
+        return np.sort(data, axis=-1)[..., lowercut:uppercut]
+    data_upper = np.partition(data, lowercut, axis=-1)[..., lowercut:]
+    num_trimmed = uppercut - lowercut
+    return np.partition(
+        data_upper,
+        num_trimmed - 1,
+        axis=-1,
+    )[..., :num_trimmed]
+
+
+def median(data: GeneratorType) -> float:
+    """Median computed on generator object"""
+    data_array = np.asarray(
+        data if isinstance(data, np.ndarray) else tuple(data)
+    )
+    if data_array.dtype.kind not in "biuf":
+        # Non-numerical items (e.g., Fraction): exact median of sorted items
+        data_sorted = sorted(data_array.tolist())
+        middle = len(data_sorted) // 2
+        if len(data_sorted) % 2:
+            return data_sorted[middle]
+        return (data_sorted[middle - 1] + data_sorted[middle]) / 2
+    return float(np.median(data_array))
+
+
+def mean_rank(data: GeneratorType) -> float:
+    """
+    Mean rank computed on generator object of ranks
+    If passed as mct, randtest() ranks the pooled data once (see
+    midranks()), such that the test statistic is the difference between
+    the mean ranks of the groups: the Wilcoxon-Mann-Whitney rank-sum test.
+    """
+    return arithmetic_mean(data)
+
+
+def midranks(data) -> tuple:
+    """
+    Ranks (1 to n) of the data, where tied items get the mean of their
+    ranks. Returns the ranks and the tie pattern, i.e. the sizes of the
+    groups of tied items in increasing order of their values.
+    """
+    data_array = np.asarray(data, dtype=float)
+    _, inverse, ties = np.unique(
+        data_array,
+        return_inverse=True,
+        return_counts=True,
+    )
+    # Highest rank of each group of ties minus half the group width
+    ranks = np.cumsum(ties) - (ties - 1) / 2
+    return ranks[inverse.reshape(data_array.shape)], tuple(ties.tolist())
+
+
+def batch_arithmetic_mean(data: np.ndarray) -> np.ndarray:
+    """Arithmetic mean computed row-wise on (n_batch, n) array"""
+    return data.mean(axis=1)
+
+
+def batch_trimmed_mean(data: np.ndarray, trim_percent=.2) -> np.ndarray:
+    """Trimmed mean computed row-wise on (n_batch, n) array"""
+    num_data_pnts = data.shape[1]
     lowercut = int(num_data_pnts * trim_percent)
     uppercut = num_data_pnts - lowercut
-    data_trimmed = data_sorted[lowercut:uppercut]
-    return sum(data_trimmed) / len(data_trimmed)
+    return _select_trimmed(data, lowercut, uppercut).mean(axis=1)
+
+
+def batch_median(data: np.ndarray) -> np.ndarray:
+    """Median computed row-wise on (n_batch, n) array"""
+    return np.median(data, axis=1)
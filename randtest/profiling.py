@@ -0,0 +1,111 @@
+"""
+Module: profiling
+
+Opt-in timing of the phases of a randomization test: setup, pool
+startup, sharing of the data, sampling of permutations and computation of
+the statistic (in the worker processes), and the whole run. Wall and CPU
+times are recorded per phase and, for the work on blocks, per worker.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+
+# Phases of the work on blocks, timed in the worker processes
+BLOCK_PHASES = ("sampling", "statistic")
+
+
+def start_timer() -> tuple:
+    """Current wall and CPU times"""
+    return time.perf_counter(), time.process_time()
+
+
+def get_times(start) -> dict:
+    """Wall and CPU times since start (see start_timer())"""
+    wall, cpu = start
+    return {
+        "wall": time.perf_counter() - wall,
+        "cpu": time.process_time() - cpu,
+    }
+
+
+@contextmanager
+def timed(timings, phase):
+    """
+    Add the wall and CPU times of the with block to timings[phase].
+    If timings is None, do nothing.
+    """
+    if timings is None:
+        yield
+        return
+    start = start_timer()
+    try:
+        yield
+    finally:
+        times = get_times(start)
+        add_times(
+            timings.setdefault(phase, {"wall": 0., "cpu": 0.}),
+            times["wall"],
+            times["cpu"],
+        )
+
+
+def add_times(times, wall, cpu):
+    """Accumulate wall and CPU times"""
+    times["wall"] += wall
+    times["cpu"] += cpu
+
+
+def get_block_record(block_timings) -> dict:
+    """Record of the work on a block in this process"""
+    record = {"pid": os.getpid()}
+    for phase in BLOCK_PHASES:
+        record[phase] = block_timings.get(phase, {"wall": 0., "cpu": 0.})
+    return record
+
+
+def add_block_record(timings, num_permutations, record):
+    """Aggregate the record of a block per phase and per worker"""
+    worker = timings.setdefault("workers", {}).setdefault(
+        record["pid"],
+        {"blocks": 0, "permutations": 0, "wall": 0., "cpu": 0.},
+    )
+    worker["blocks"] += 1
+    worker["permutations"] += num_permutations
+    for phase in BLOCK_PHASES:
+        times = record[phase]
+        add_times(
+            timings.setdefault(phase, {"wall": 0., "cpu": 0.}),
+            times["wall"],
+            times["cpu"],
+        )
+        add_times(worker, times["wall"], times["cpu"])
+
+
+def format_timings(timings) -> str:
+    """Human-readable timings, e.g. for the CLIs"""
+    lines = ["Timings (wall / CPU seconds)"]
+    for phase, times in timings.items():
+        if phase in ("workers", "permutations_per_second"):
+            continue
+        lines.append("  {} = {:.4g} / {:.4g}".format(
+            phase,
+            times["wall"],
+            times["cpu"],
+        ))
+    lines.append("  permutations per second = {:.4g}".format(
+        timings.get("permutations_per_second", 0.),
+    ))
+    for pid, worker in timings.get("workers", {}).items():
+        lines.append(
+            "  worker pid {}: {} blocks, {} permutations, "
+            "{:.4g} / {:.4g}".format(
+                pid,
+                worker["blocks"],
+                worker["permutations"],
+                worker["wall"],
+                worker["cpu"],
+            )
+        )
+    return "\n".join(lines)
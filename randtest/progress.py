@@ -0,0 +1,152 @@
+"""
+Module:
+Throttled progress reporting of randomization tests
+
+Progress is reported per block of permutations, at most every `interval`
+seconds or every `every` permutations, and at the end of the test. By
+default, reports are logged at the INFO level. A callback receives
+Progress records, e.g., for a dashboard.
+"""
+
+import logging
+from collections import namedtuple
+from time import perf_counter
+from .sequential import clopper_pearson
+
+
+Progress = namedtuple(
+    "Progress",
+    [
+        "method",
+        "num_successes",
+        "num_permutations",
+        "p_value",
+        "confidence_interval",
+        "permutations_per_second",
+        "elapsed",
+        "final",
+    ],
+)
+Progress.__doc__ = """
+Progress record of a randomization test
+
+    method : str
+        Indicates type of randomization test.
+
+    num_successes : int
+        Number of successes so far. For randtest_many(), the smallest
+        number of successes over all metrics.
+
+    num_permutations : int
+        Number of permutations so far.
+
+    p_value : float
+        Current p value: `num_successes / num_permutations`, nan without
+        permutations (e.g., a shard that has none).
+
+    confidence_interval : tuple, None
+        Clopper-Pearson confidence interval of the p value (Monte Carlo
+        randomization tests only, otherwise None).
+
+    permutations_per_second : float
+        Number of permutations per second so far.
+
+    elapsed : float
+        Seconds since the start of the test.
+
+    final : bool
+        Whether this is the final report of the test.
+"""
+
+
+class ProgressReporter:
+    """
+    ProgressReporter Class
+
+    Parameters
+    ----------
+        callback : None, function
+            Function called with a Progress record per report.
+            Default: None, i.e., log reports at the INFO level.
+
+        interval : None, float
+            Minimum number of seconds between reports (default: 1).
+
+        every : None, int
+            Report every `every` permutations (default: None).
+
+        confidence : float
+            Confidence level of the confidence interval (default: 0.95).
+    """
+    def __init__(self, callback=None, interval=1., every=None, confidence=.95):
+        self.callback = callback
+        self.interval = interval
+        self.every = every
+        self.confidence = confidence
+        self.enabled = True
+        self._start = self._last_time = perf_counter()
+        self._last_count = 0
+
+    def start(self):
+        """Start timing a randomization test"""
+        # Without a callback, reports are only needed if INFO is logged
+        self.enabled = (
+            self.callback is not None or
+            logging.getLogger().isEnabledFor(logging.INFO)
+        )
+        self._start = self._last_time = perf_counter()
+        self._last_count = 0
+
+    def update(self, method, num_successes, num_permutations, final=False):
+        """Report progress if due (or final)"""
+        if not self.enabled:
+            return
+        now = perf_counter()
+        is_due = (
+            final or
+            (self.every is not None and
+             num_permutations - self._last_count >= self.every) or
+            (self.interval is not None and
+             now - self._last_time >= self.interval)
+        )
+        if not is_due:
+            return
+        self._last_time = now
+        self._last_count = num_permutations
+
+        elapsed = now - self._start
+        p_value = float("nan")
+        confidence_interval = None
+        if num_permutations > 0:
+            p_value = num_successes / num_permutations
+        if method != "Systematic" and num_permutations > 0:
+            confidence_interval = clopper_pearson(
+                num_successes,
+                num_permutations,
+                1. - self.confidence,
+            )
+        progress = Progress(
+            method,
+            num_successes,
+            num_permutations,
+            p_value,
+            confidence_interval,
+            num_permutations / elapsed if elapsed > 0 else float("inf"),
+            elapsed,
+            final,
+        )
+        if self.callback is None:
+            log_progress(progress)
+        else:
+            self.callback(progress)
+
+
+def log_progress(progress: Progress):
+    """Log a Progress record at the INFO level"""
+    logging.info(
+        "p value = %d / %d = %g :: %.4g permutations/s",
+        progress.num_successes,
+        progress.num_permutations,
+        progress.p_value,
+        progress.permutations_per_second,
+    )
@@ -4,8 +4,15 @@ available on the command line.
 """
 
 from statistics import mean
-from .base import randtest, test_statistic
-from .argparser_bp import read_data, argparse_cli
+from .base import test_statistic
+from .session import RandTestSession
+from .argparser_bp import (
+    read_groups,
+    get_column_fname,
+    get_shard,
+    argparse_cli,
+)
+from .profiling import format_timings
 
 
 def main():
@@ -16,19 +23,32 @@ def main():
     """
     parser = argparse_cli(description)
     args = parser.parse_args()
-    data_group_a = read_data(args.fname_data_A)
-    data_group_b = read_data(args.fname_data_B)
-    result = randtest(
-        data_group_a=data_group_a,
-        data_group_b=data_group_b,
-        mct=mean,
-        tstat=test_statistic,
-        num_permutations=args.p,
-        alternative=args.a,
-        num_jobs=args.n,
-        log_level=args.l,
-        seed=args.s)
-    print(result)
+    # One pool of workers for all value columns
+    with RandTestSession(num_jobs=args.n, log_level=args.l) as session:
+        for column, data_group_a, data_group_b in read_groups(args):
+            shard = get_shard(args, column)
+            result = session.randtest(
+                data_group_a=data_group_a,
+                data_group_b=data_group_b,
+                mct=mean,
+                tstat=test_statistic,
+                num_permutations=args.p,
+                alternative=args.a,
+                seed=args.s,
+                profile=args.profile,
+                checkpoint=get_column_fname(args.checkpoint, column),
+                shard=shard)
+            if column is not None:
+                print("Value column = {}".format(column))
+            print(result)
+            if shard is not None:
+                print("Partial result of shard {}/{} written to {}".format(
+                    shard.index,
+                    shard.count,
+                    shard.fname,
+                ))
+            if args.profile:
+                print(format_timings(result.timings))
 
 
 if __name__ == '__main__':
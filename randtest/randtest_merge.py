@@ -0,0 +1,37 @@
+"""
+Make the merge of the partial results of sharded randomization tests
+(`randtest-merge`) available on the command line.
+"""
+
+import argparse
+from randtest import __version__
+from .base import merge_shards
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description=(
+            "Merge the partial results of all shards of a randomization " +
+            "test (see --shard of randtest-mean and randtest-tmean)."
+        ),
+    )
+    parser.add_argument(
+        "-v",
+        "--version",
+        action="version",
+        version=__version__,
+    )
+    parser.add_argument(
+        "fnames",
+        metavar="file",
+        type=str,
+        nargs="+",
+        help="files of the partial results of all shards.",
+    )
+    args = parser.parse_args()
+    print(merge_shards(args.fnames))
+
+
+if __name__ == '__main__':
+    main()
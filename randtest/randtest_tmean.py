@@ -4,9 +4,16 @@ available on the command line.
 """
 
 from functools import partial
-from .base import randtest, test_statistic
+from .base import test_statistic
+from .session import RandTestSession
 from .mcts import trimmed_mean
-from .argparser_bp import read_data, argparse_cli
+from .argparser_bp import (
+    read_groups,
+    get_column_fname,
+    get_shard,
+    argparse_cli,
+)
+from .profiling import format_timings
 
 
 def main():
@@ -29,20 +36,32 @@ def main():
     # Use functools.partial to set parameters
     tmean = partial(trimmed_mean, trim_percent=alpha)
 
-    data_group_a = read_data(args.fname_data_A)
-    data_group_b = read_data(args.fname_data_B)
-
-    result = randtest(
-        data_group_a=data_group_a,
-        data_group_b=data_group_b,
-        mct=tmean,
-        tstat=test_statistic,
-        num_permutations=args.p,
-        alternative=args.a,
-        num_jobs=args.n,
-        log_level=args.l,
-        seed=args.s)
-    print(result)
+    # One pool of workers for all value columns
+    with RandTestSession(num_jobs=args.n, log_level=args.l) as session:
+        for column, data_group_a, data_group_b in read_groups(args):
+            shard = get_shard(args, column)
+            result = session.randtest(
+                data_group_a=data_group_a,
+                data_group_b=data_group_b,
+                mct=tmean,
+                tstat=test_statistic,
+                num_permutations=args.p,
+                alternative=args.a,
+                seed=args.s,
+                profile=args.profile,
+                checkpoint=get_column_fname(args.checkpoint, column),
+                shard=shard)
+            if column is not None:
+                print("Value column = {}".format(column))
+            print(result)
+            if shard is not None:
+                print("Partial result of shard {}/{} written to {}".format(
+                    shard.index,
+                    shard.count,
+                    shard.fname,
+                ))
+            if args.profile:
+                print(format_timings(result.timings))
 
 
 if __name__ == '__main__':
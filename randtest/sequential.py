@@ -0,0 +1,97 @@
+"""
+Module:
+Stopping rule for the sequential Monte Carlo randomization test
+
+After each block of permutations, a Clopper-Pearson confidence interval
+for the p value is computed. The test stops as soon as the interval lies
+entirely below or above the significance level alpha. The error of the
+k-th interval is tolerance * 6 / (pi^2 k^2), which sums up to the
+tolerance over any number of looks. Hence, the probability that the
+sequential test decides differently than a test with infinitely many
+permutations is at most the tolerance.
+"""
+
+from math import exp, lgamma, log, pi
+
+
+def betainc(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta function I_x(a, b)"""
+    if x <= 0.:
+        return 0.
+    if x >= 1.:
+        return 1.
+    log_front = (
+        lgamma(a + b) - lgamma(a) - lgamma(b) +
+        a * log(x) + b * log(1. - x)
+    )
+    if x < (a + 1.) / (a + b + 2.):
+        return exp(log_front) * _betacf(a, b, x) / a
+    return 1. - exp(log_front) * _betacf(b, a, 1. - x) / b
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    """Continued fraction of betainc() (modified Lentz's method)"""
+    tiny = 1e-300
+    c = 1.
+    d = 1. - (a + b) * x / (a + 1.)
+    d = 1. / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 100000):
+        for numerator in [
+                m * (b - m) * x / ((a + 2 * m - 1.) * (a + 2 * m)),
+                -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1.))]:
+            d = 1. + numerator * d
+            d = 1. / (d if abs(d) > tiny else tiny)
+            c = 1. + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1.) < 1e-15:
+            break
+    return result
+
+
+def beta_ppf(q: float, a: float, b: float) -> float:
+    """Quantile function of the beta distribution (bisection)"""
+    lower, upper = 0., 1.
+    for _ in range(100):
+        middle = (lower + upper) / 2.
+        if betainc(a, b, middle) < q:
+            lower = middle
+        else:
+            upper = middle
+        if upper - lower < 1e-15:
+            break
+    return (lower + upper) / 2.
+
+
+def clopper_pearson(num_successes: int, num_trials: int, error: float):
+    """Clopper-Pearson interval with coverage 1 - error"""
+    if num_successes == 0:
+        lower = 0.
+    else:
+        lower = beta_ppf(
+            error / 2,
+            num_successes,
+            num_trials - num_successes + 1,
+        )
+    if num_successes == num_trials:
+        upper = 1.
+    else:
+        upper = beta_ppf(
+            1. - error / 2,
+            num_successes + 1,
+            num_trials - num_successes,
+        )
+    return lower, upper
+
+
+def is_settled(
+        num_successes: int,
+        num_trials: int,
+        alpha: float,
+        tolerance: float,
+        look: int) -> bool:
+    """Decide whether the p value is known to be below or above alpha"""
+    error = tolerance * 6 / (pi ** 2 * look ** 2)
+    lower, upper = clopper_pearson(num_successes, num_trials, error)
+    return upper < alpha or lower > alpha
@@ -0,0 +1,74 @@
+"""
+Module: session
+
+Implements a session that keeps a pool of worker processes alive across
+randomization tests, such that repeated (small) tests do not pay for the
+start and teardown of processes.
+"""
+
+import multiprocessing as mp
+from multiprocessing import resource_tracker
+from .base import get_num_jobs, randtest, set_log_level
+from .many import randtest_many
+
+
+class RandTestSession:
+    """
+    RandTestSession Class
+
+    Context manager holding warm worker processes for repeated calls of
+    randtest() and randtest_many().
+
+    Example
+    -------
+    >>> with RandTestSession(num_jobs=4) as session:
+    ...     results = [session.randtest(x, y, seed=0) for x, y in pairs]
+    """
+    def __init__(self, num_jobs=-1, log_level="warn"):
+        assert isinstance(num_jobs, int) and num_jobs != 0
+        assert (
+            isinstance(log_level, str) and
+            log_level in ["debug", "info", "warn", "error", "critical"]
+        )
+        set_log_level(log_level)
+        self.njobs = get_num_jobs(num_jobs)
+        self.log_level = log_level
+        self.pool = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """Start the worker processes (a single job runs in-process)"""
+        if self.pool is None and self.njobs > 1:
+            # Workers share the resource tracker of this process: shared
+            # memory they attach to is unregistered when the test unlinks
+            # it, instead of being reported as leaked by their own tracker
+            resource_tracker.ensure_running()
+            self.pool = mp.Pool(self.njobs)
+
+    def close(self):
+        """Stop the worker processes"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def randtest(self, data_group_a, data_group_b, **kwargs):
+        """Perform randtest() with the workers of this session"""
+        kwargs.setdefault("log_level", self.log_level)
+        return randtest(data_group_a, data_group_b, session=self, **kwargs)
+
+    def randtest_many(self, data_group_a, data_group_b, **kwargs):
+        """Perform randtest_many() with the workers of this session"""
+        kwargs.setdefault("log_level", self.log_level)
+        return randtest_many(
+            data_group_a,
+            data_group_b,
+            session=self,
+            **kwargs,
+        )
@@ -0,0 +1,98 @@
+"""
+Module: shards
+Distributed randomization tests without a cluster service
+
+The permutations of a test are split into shards: systematic tests by
+ranges of combination ranks, Monte Carlo tests by their random streams
+(stream `i` belongs to shard `i % count + 1`). Each shard is run
+separately, e.g., `randtest-mean --shard 3/16 --shard-file part3.json` in
+a job of a batch scheduler, and writes its partial result to a JSON file.
+randtest.merge_shards() combines the partial results of all shards into
+one RandTestResult, equal to the result of the unsharded test.
+"""
+
+import os
+import json
+from collections import namedtuple
+
+
+Shard = namedtuple("Shard", ["index", "count", "fname"])
+Shard.__doc__ = """
+Shard of a randomization test
+
+    index : int
+        Index of the shard, from 1 to `count`.
+
+    count : int
+        Number of shards.
+
+    fname : str
+        File name of the partial result of the shard.
+"""
+
+
+def parse_shard(text: str, fname: str) -> Shard:
+    """Shard from text 'index/count', e.g. '3/16' (see `--shard`)"""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(
+            "### error: shard '{}' is not of the form index/count."
+            .format(text)
+        ) from None
+    if not 1 <= index <= count:
+        raise ValueError(
+            "### error: shard index must be between 1 and {}.".format(count)
+        )
+    return Shard(index, count, fname)
+
+
+def get_shard_range(first: int, total: int, shard: Shard) -> tuple:
+    """Range of the ranks first to total - 1 that belongs to the shard"""
+    num_ranks = total - first
+    return (
+        first + num_ranks * (shard.index - 1) // shard.count,
+        first + num_ranks * shard.index // shard.count,
+    )
+
+
+def write_shard(shard: Shard, state: dict):
+    """Write the partial result of the shard (atomically: write and rename)"""
+    fname_tmp = "{}.{}.tmp".format(shard.fname, os.getpid())
+    with open(fname_tmp, "w") as fobj:
+        json.dump(dict(state, index=shard.index, count=shard.count), fobj)
+    os.replace(fname_tmp, shard.fname)
+
+
+def read_shards(fnames) -> list:
+    """
+    Partial results of all shards of a test. Raise ValueError if the
+    files belong to different tests, if Monte Carlo shards were run with
+    different seeds, or if shards are missing or duplicated.
+    """
+    states = []
+    for fname in fnames:
+        with open(fname, "r") as fobj:
+            states.append(json.load(fobj))
+    if not states:
+        raise ValueError("### error: no shards to merge.")
+    first = states[0]
+    for state in states[1:]:
+        if (state["key"], state["count"]) != (first["key"], first["count"]):
+            raise ValueError("### error: shards belong to different tests.")
+        # Systematic tests enumerate the same permutations for any seed
+        if first["method"] != "Systematic" and (
+                (state["entropy"], state["spawn_key"]) !=
+                (first["entropy"], first["spawn_key"])):
+            raise ValueError(
+                "### error: shards were run with different seeds."
+            )
+    indices = sorted(state["index"] for state in states)
+    if indices != list(range(1, first["count"] + 1)):
+        raise ValueError(
+            "### error: shards 1 to {} required, got {}.".format(
+                first["count"],
+                indices,
+            )
+        )
+    return states
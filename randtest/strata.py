@@ -0,0 +1,136 @@
+"""
+Module: strata
+Stratified (blocked) randomization tests
+
+In a stratified experiment, e.g., by region and day, the units are
+randomized to the groups within each stratum. Hence, the permutations of
+the test keep the number of units of group A per stratum fixed and permute
+the labels independently per stratum. A permutation of the whole data is
+a combination of group A members per stratum: the systematic test
+enumerates the product of the combinations of all strata by mixed-radix
+ranks, the Monte Carlo test draws the combinations of each stratum for a
+whole block at once.
+"""
+
+from collections import namedtuple
+import numpy as np
+from .combinatorics import binomial, unrank_combination
+
+
+Stratum = namedtuple("Stratum", ["indices", "n_x"])
+Stratum.__doc__ = """
+Stratum of a stratified randomization test
+
+    indices : tuple
+        Indices of the units of the stratum in the pooled data, those of
+        group A first.
+
+    n_x : int
+        Number of units of group A in the stratum.
+"""
+
+
+def get_strata(labels, n_x: int) -> tuple:
+    """
+    Strata of the pooled data (group A first, n_x units) by their
+    stratum labels, in order of first appearance of the labels
+    """
+    indices = {}
+    for i, label in enumerate(labels):
+        indices.setdefault(label, []).append(i)
+    return tuple(
+        Stratum(tuple(stratum), sum(i < n_x for i in stratum))
+        for stratum in indices.values()
+    )
+
+
+def num_stratified_permutations(strata) -> int:
+    """Number of permutations within strata: product of the combinations"""
+    total = 1
+    for stratum in strata:
+        total *= binomial(len(stratum.indices), stratum.n_x)
+    return total
+
+
+def unrank_stratified(rank: int, strata) -> tuple:
+    """
+    Group A indices of the permutation with given mixed-radix rank: the
+    digits are the lexicographic ranks of the combinations per stratum,
+    the last stratum varying fastest
+    """
+    digits = []
+    for stratum in reversed(strata):
+        rank, digit = divmod(
+            rank,
+            binomial(len(stratum.indices), stratum.n_x),
+        )
+        digits.append(digit)
+    digits.reverse()
+    return tuple(
+        stratum.indices[i]
+        for stratum, digit in zip(strata, digits)
+        for i in unrank_combination(digit, len(stratum.indices), stratum.n_x)
+    )
+
+
+def iter_stratified(strata, start: int, stop: int):
+    """
+    Generate the group A indices of the permutations with mixed-radix
+    ranks in [start, stop). Only the combinations of the strata whose
+    digits change are unranked.
+    """
+    if start >= stop:
+        return
+    radices = [
+        binomial(len(stratum.indices), stratum.n_x)
+        for stratum in strata
+    ]
+    digits = []
+    rank = start
+    for radix in reversed(radices):
+        rank, digit = divmod(rank, radix)
+        digits.append(digit)
+    digits.reverse()
+    parts = [
+        tuple(
+            stratum.indices[i]
+            for i in unrank_combination(digit, len(stratum.indices),
+                                        stratum.n_x)
+        )
+        for stratum, digit in zip(strata, digits)
+    ]
+    for _ in range(stop - start):
+        yield sum(parts, ())
+        # Increment the mixed-radix digits, last stratum fastest
+        for h in range(len(strata) - 1, -1, -1):
+            digits[h] = (digits[h] + 1) % radices[h]
+            stratum = strata[h]
+            parts[h] = tuple(
+                stratum.indices[i]
+                for i in unrank_combination(
+                    digits[h],
+                    len(stratum.indices),
+                    stratum.n_x,
+                )
+            )
+            if digits[h]:
+                break
+
+
+def draw_stratified(rng, strata, length: int) -> np.ndarray:
+    """
+    Draw the (length, n_x) group A indices of a block of permutations
+    within strata: one vectorized shuffle per stratum
+    """
+    parts = []
+    for stratum in strata:
+        if stratum.n_x == 0:
+            continue
+        indices = np.broadcast_to(
+            np.array(stratum.indices),
+            (length, len(stratum.indices)),
+        )
+        parts.append(rng.permuted(indices, axis=1)[:, :stratum.n_x])
+    if not parts:
+        return np.zeros((length, 0), dtype=int)
+    return np.concatenate(parts, axis=1)
@@ -0,0 +1,153 @@
+"""
+Module: streaming
+
+Implements a Monte Carlo randomization test for the difference of
+arithmetic means over observations that arrive one at a time.
+
+Each permutation is a fixed random assignment of the group labels to the
+observations, and its sum of group A is kept as a running sum. A new
+observation is inserted into every assignment by one step of the
+inside-out Fisher-Yates shuffle: it takes the label of a uniformly chosen
+position (possibly its own), which in turn receives the new label. Hence,
+every assignment remains a uniformly random permutation of the observed
+labels, and one observation updates all running sums in O(num_permutations).
+"""
+
+import numpy as np
+from .base import RandTestResult, get_seed_sequence, is_batch_success
+
+
+# Initial number of observations the label assignments can hold
+INITIAL_CAPACITY = 64
+
+
+class StreamingRandTest:
+    """
+    StreamingRandTest Class
+
+    Parameters
+    ----------
+        num_permutations : int
+            Number of permutations, including the observed one.
+
+        alternative : str
+            Alternative hypothesis.
+            Possible values: 'two_sided' (default), 'greater', and 'less'.
+
+        seed : None, int, random.Random(), numpy.random.SeedSequence() instance
+
+    The label assignments take num_permutations bytes per observation.
+
+    Example
+    -------
+    >>> stream = StreamingRandTest(num_permutations=10000, seed=0)
+    >>> for group, value in observations:
+    ...     stream.add_a(value) if group == "A" else stream.add_b(value)
+    ...     p_value = stream.p_value
+    """
+    def __init__(self, num_permutations=10000, alternative="two_sided",
+                 seed=None):
+        assert isinstance(num_permutations, int) and num_permutations > 1
+        assert (
+            isinstance(alternative, str) and
+            alternative in ["two_sided", "greater", "less"]
+        )
+        self.alternative = alternative
+        self.num_permutations = num_permutations
+        self.seed = seed
+        self.rng = np.random.default_rng(get_seed_sequence(seed))
+
+        # Valid Monte Carlo Randomization Test includes observed tobs
+        # Generate one random permutation less
+        num_random = num_permutations - 1
+        self.values = np.empty(INITIAL_CAPACITY)
+        self.labels = np.empty((num_random, INITIAL_CAPACITY), dtype=bool)
+        self.sums_a = np.zeros(num_random)
+        self.n_a = 0
+        self.n_b = 0
+        self.sum_a = 0.
+        self.sum_b = 0.
+        self.scale = 0.
+
+    @property
+    def n_data(self) -> int:
+        """Getter: number of observations"""
+        return self.n_a + self.n_b
+
+    def add_a(self, value):
+        """Add an observation of group A"""
+        self._add(float(value), True)
+        self.n_a += 1
+        self.sum_a += value
+
+    def add_b(self, value):
+        """Add an observation of group B"""
+        self._add(float(value), False)
+        self.n_b += 1
+        self.sum_b += value
+
+    def _add(self, value, label):
+        """Insert an observation into all label assignments"""
+        position = self.n_data
+        if position == self.values.shape[0]:
+            self._grow()
+        self.values[position] = value
+        self.scale += abs(value)
+
+        rows = np.arange(self.labels.shape[0])
+        swaps = self.rng.integers(0, position + 1, size=rows.shape[0])
+        self.labels[:, position] = label
+        swapped = self.labels[rows, swaps]
+        # The new observation takes the label of the swapped position,
+        # which receives the new label (no change if it is its own)
+        self.labels[:, position] = swapped
+        self.labels[rows, swaps] = label
+        self.sums_a += value * swapped
+        self.sums_a += self.values[swaps] * (label - swapped.astype(float))
+
+    def _grow(self):
+        """Double the number of observations the assignments can hold"""
+        capacity = 2 * self.values.shape[0]
+        values = np.empty(capacity)
+        values[:self.n_data] = self.values
+        labels = np.empty((self.labels.shape[0], capacity), dtype=bool)
+        labels[:, :self.n_data] = self.labels
+        self.values, self.labels = values, labels
+
+    @property
+    def num_successes(self) -> int:
+        """Getter: number of successes, including the observed one"""
+        assert self.n_a > 0 and self.n_b > 0
+        center = (self.sum_a + self.sum_b) * self.n_a / self.n_data
+        # Tolerance absorbs rounding differences of the running sums,
+        # which grow with the number of updates
+        gamma = self.scale * np.finfo(float).eps * (100 + self.n_data)
+        hits = is_batch_success(
+            self.sums_a,
+            self.sum_a,
+            center,
+            gamma,
+            self.alternative,
+        )
+        # Valid Monte Carlo Randomization Test includes observed tobs
+        return int(np.count_nonzero(hits)) + 1
+
+    @property
+    def p_value(self) -> float:
+        """Getter: current p value"""
+        return self.num_successes / self.num_permutations
+
+    def result(self) -> RandTestResult:
+        """Current result of the randomization test"""
+        mcta = self.sum_a / self.n_a
+        mctb = self.sum_b / self.n_b
+        return RandTestResult(
+            "Monte Carlo",
+            self.alternative,
+            mcta,
+            mctb,
+            mcta - mctb,
+            self.num_successes,
+            self.num_permutations,
+            self.seed,
+        )
@@ -1,36 +1,40 @@
 """Packaging settings"""
 
+import re
 from pathlib import Path
 from setuptools import setup, find_packages
 
 
-from randtest import (
-    __author__,
-    __email__,
-    __version__,
-)
-
-
 base_directory = Path(__file__).parent.resolve()
 long_desc = base_directory.joinpath("README.md").read_text()
 
+# Read the metadata without importing randtest (and its dependencies)
+init_text = base_directory.joinpath("randtest", "__init__.py").read_text()
+metadata = dict(re.findall(
+    r'^__(author|email|version)__ = "([^"]*)"$',
+    init_text,
+    re.MULTILINE,
+))
+
 
 setup(
     name="randtest",
-    version=__version__,
-    author=__author__,
-    author_email=__email__,
+    version=metadata["version"],
+    author=metadata["author"],
+    author_email=metadata["email"],
     description="Randomization tests for two-sample comparison.",
     long_description=long_desc,
     long_description_content_type="text/markdown",
     url="https://github.com/estripling/randtest",
-    python_requires=">= 3.7",
+    python_requires=">= 3.8",
     packages=find_packages(),
+    install_requires=["numpy >= 1.20"],
     license="MIT",
     entry_points={
         "console_scripts": [
             "randtest-mean = randtest.randtest_mean:main",
             "randtest-tmean = randtest.randtest_tmean:main",
+            "randtest-merge = randtest.randtest_merge:main",
         ]
     },
     classifiers=[